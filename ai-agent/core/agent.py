@@ -1,37 +1,185 @@
 import asyncio
+import aiohttp
+import time
+from collections import OrderedDict
 import json
+import os
+import re
 import uuid
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Dict, List, Optional, Any, Union, Tuple
 from loguru import logger
 
 from langchain.llms import OpenAI
 from langchain.chat_models import ChatOpenAI
-from langchain.schema import HumanMessage, SystemMessage
-from langchain.memory import ConversationBufferMemory
-from langchain.prompts import PromptTemplate
+from langchain.schema import HumanMessage, SystemMessage, AIMessage, BaseMessage
+from langchain.prompts.chat import BaseChatPromptTemplate
 from langchain.chains import LLMChain
 from langchain.agents import Tool, AgentExecutor, LLMSingleActionAgent
 from langchain.schema import AgentAction, AgentFinish
+from langchain.callbacks.streaming_aiter_final_only import AsyncFinalIteratorCallbackHandler
+
+# orjson serializes request context considerably faster when installed
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
 
 from .product_search import ProductSearchEngine
 from .conversation_manager import ConversationManager
 from .payment_processor import PaymentProcessor
+from .clock import now_iso
+from .order_processing import process_paid_order
 from integrations.temu_client import TemuClient
 from integrations.correos_client import CorreosClient
 from integrations.sinpe_client import SinpeClient
 from utils.database import get_db
 from utils.auth import verify_token
 
+# Prompt templates shared by every agent instance
+_PROMPTS: Dict[str, str] = {
+    # Rendered once per agent (tools are static) so the system message is an
+    # identical prefix on every call and can be served from the provider's prompt cache
+    "agent_system_prompt": """You are Shaymee, a friendly and helpful AI assistant for an online store in Costa Rica. You help customers find products, make purchases, and track their orders.
+
+Your personality:
+- Always be polite and courteous in Spanish
+- Use "usted" form for respect
+- Be helpful and patient
+- Provide clear and concise information
+- Always mention that you're from Shaymee store
+
+Available tools:
+{tools}""",
+    
+    # Per-call human turn, appended after the system prefix and chat history
+    "agent_turn_prompt": """{input}
+{agent_scratchpad}""",
+    
+    "greeting_prompt": """¡Hola! Soy Shaymee, tu asistente virtual de la tienda Shaymee. 
+
+¿En qué puedo ayudarte hoy? Puedo:
+• Ayudarte a encontrar productos
+• Mostrarte nuestras categorías
+• Procesar tu compra
+• Dar seguimiento a tus pedidos
+
+¿Qué te gustaría hacer?""",
+    
+    "product_search_prompt": """Basándome en tu descripción, aquí tienes algunos productos que podrían interesarte:
+
+{products}
+
+¿Te gustaría ver más detalles de algún producto o necesitas ayuda con algo más?""",
+    
+    "payment_prompt": """Perfecto, he generado tu link de pago SINPE:
+
+🔗 Link de Pago: {payment_link}
+💰 Total: ₡{amount}
+📦 Pedido: #{order_id}
+
+Una vez que realices el pago, te enviaré la confirmación y comenzaremos a procesar tu pedido.
+
+¿Necesitas ayuda con el pago?""",
+    
+    "order_confirmation_prompt": """¡Excelente! Tu pedido ha sido confirmado:
+
+📦 Pedido: #{order_id}
+✅ Estado: Confirmado
+📅 Fecha: {date}
+🚚 Envío: En proceso
+
+Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo que pueda ayudarte?"""
+}
+
+# Tool catalog: (tool name, bound method name, description)
+_TOOL_SPECS = (
+    ("search_products", "_search_products_tool",
+     "Search for products in the catalog. Use this when user asks for products or wants to buy something."),
+    ("get_categories", "_get_categories_tool",
+     "Get available product categories. Use this when user asks about categories or wants to browse."),
+    ("create_order", "_create_order_tool",
+     "Create a new order for products. Use this when user wants to purchase items."),
+    ("generate_payment", "_generate_payment_tool",
+     "Generate payment link for SINPE. Use this when user is ready to pay."),
+    ("track_order", "_track_order_tool",
+     "Track order status and shipment. Use this when user asks about their order status."),
+    ("get_user_info", "_get_user_info_tool",
+     "Get user information and preferences. Use this to personalize responses."),
+)
+
+# Sliding window of previous turns replayed into the prompt (3 turns = 6 messages);
+# each message is clipped so one long reply cannot dominate the prompt
+_HISTORY_LIMIT = 3
+_HISTORY_MAX_CHARS = 1500
+
+# Tool call in agent output: first "Action:" line and the "Action Input:" line after it
+_ACTION_RE = re.compile(r"Action:([^\n]*).*?Action Input:([^\n]*)", re.DOTALL)
+
+# Shared HTTP connection pool for the Correos/SINPE clients
+_HTTP_MAX_CONNECTIONS = 200
+_HTTP_MAX_CONNECTIONS_PER_HOST = 50
+
+# Product search results cached per normalized query
+_SEARCH_CACHE_SIZE = 1024
+_SEARCH_CACHE_TTL = 600  # seconds
+
+# Analytics are served from memory and recomputed in the background once older than this
+_ANALYTICS_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "60"))  # seconds
+
+def _context_json(context: Dict[str, Any]) -> str:
+    if HAS_ORJSON:
+        return orjson.dumps(context, default=str).decode("utf-8")
+    return json.dumps(context, separators=(",", ":"), ensure_ascii=False, default=str)
+
+class _AgentPrompt(BaseChatPromptTemplate):
+    """
+    Chat prompt with a constant system prefix:
+    [system, *history, *context, human turn].
+    
+    Nothing per-call is interpolated into the system message, so its tokens
+    are byte-identical across requests and users.
+    """
+    
+    system_message: SystemMessage
+    turn_template: str
+    
+    def format_messages(self, **kwargs: Any) -> List[BaseMessage]:
+        scratchpad = "".join(
+            f"{action.log}\nObservation: {observation}\nThought: "
+            for action, observation in kwargs.get("intermediate_steps", [])
+        )
+        turn = self.turn_template.format(input=kwargs["input"], agent_scratchpad=scratchpad)
+        return [
+            self.system_message,
+            *kwargs.get("chat_history", []),
+            *kwargs.get("context_messages", []),
+            HumanMessage(content=turn)
+        ]
+
 class ShaymeeAgent:
     """
-    Main AI Agent for Shaymee store that orchestrates all interactions
+    Main AI Agent for Shaymee store that orchestrates all interactions.
+    
+    The agent holds no per-user state: conversation history is loaded from
+    ConversationManager on every call, so a single instance (see `instance()`)
+    can serve all users.
     """
     
+    _instance: Optional["ShaymeeAgent"] = None
+    
+    @classmethod
+    def instance(cls) -> "ShaymeeAgent":
+        """Return the shared agent, building it on first use"""
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+    
     def __init__(self):
         self.llm = ChatOpenAI(
             model_name="gpt-4",
             temperature=0.7,
+            streaming=True,
             openai_api_key=os.getenv("OPENAI_API_KEY")
         )
         
@@ -42,12 +190,21 @@ class ShaymeeAgent:
         self.temu_client = TemuClient()
         self.correos_client = CorreosClient()
         self.sinpe_client = SinpeClient()
+        # Pooled keep-alive session, created on the event loop in startup()
+        self._http_session: Optional[aiohttp.ClientSession] = None
         
-        # Initialize memory for conversations
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # Cap in-flight agent runs so bursts queue here instead of tripping OpenAI rate limits
+        self._llm_semaphore = asyncio.Semaphore(int(os.getenv("OPENAI_CONCURRENCY", "20")))
+        
+        # Prompts are static, share the module-level templates
+        self.prompts = _PROMPTS
+        
+        # LRU of normalized query -> (expires_at, products)
+        self._search_cache: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        
+        # Last analytics summary as (expires_at, analytics) and its in-flight refresh
+        self._analytics: Optional[Tuple[float, Dict[str, Any]]] = None
+        self._analytics_refresh: Optional[asyncio.Task] = None
         
         # Initialize tools
         self.tools = self._initialize_tools()
@@ -55,52 +212,46 @@ class ShaymeeAgent:
         # Initialize agent
         self.agent_executor = self._initialize_agent()
         
-        # Load prompts
-        self.prompts = self._load_prompts()
-        
         logger.info("Shaymee AI Agent initialized successfully")
     
+    async def startup(self):
+        """Open the shared HTTP session and hand it to the integration clients"""
+        if self._http_session is not None and not self._http_session.closed:
+            return
+        self._http_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=_HTTP_MAX_CONNECTIONS,
+                limit_per_host=_HTTP_MAX_CONNECTIONS_PER_HOST
+            )
+        )
+        self.correos_client.use_session(self._http_session)
+        self.sinpe_client.use_session(self._http_session)
+    
+    async def aclose(self):
+        """Close the shared HTTP session"""
+        if self._analytics_refresh is not None:
+            self._analytics_refresh.cancel()
+            self._analytics_refresh = None
+        if self._http_session is not None:
+            await self._http_session.close()
+            self._http_session = None
+    
     def _initialize_tools(self) -> List[Tool]:
         """Initialize tools for the agent"""
-        tools = [
-            Tool(
-                name="search_products",
-                func=self._search_products_tool,
-                description="Search for products in the catalog. Use this when user asks for products or wants to buy something."
-            ),
-            Tool(
-                name="get_categories",
-                func=self._get_categories_tool,
-                description="Get available product categories. Use this when user asks about categories or wants to browse."
-            ),
-            Tool(
-                name="create_order",
-                func=self._create_order_tool,
-                description="Create a new order for products. Use this when user wants to purchase items."
-            ),
-            Tool(
-                name="generate_payment",
-                func=self._generate_payment_tool,
-                description="Generate payment link for SINPE. Use this when user is ready to pay."
-            ),
-            Tool(
-                name="track_order",
-                func=self._track_order_tool,
-                description="Track order status and shipment. Use this when user asks about their order status."
-            ),
-            Tool(
-                name="get_user_info",
-                func=self._get_user_info_tool,
-                description="Get user information and preferences. Use this to personalize responses."
-            )
+        return [
+            Tool(name=name, func=getattr(self, method_name), description=description)
+            for name, method_name, description in _TOOL_SPECS
         ]
-        return tools
     
     def _initialize_agent(self) -> AgentExecutor:
         """Initialize the agent executor"""
-        prompt = PromptTemplate(
-            input_variables=["input", "chat_history", "agent_scratchpad"],
-            template=self.prompts["agent_prompt"]
+        tool_catalog = "\n".join(f"{tool.name}: {tool.description}" for tool in self.tools)
+        prompt = _AgentPrompt(
+            input_variables=["input", "chat_history", "context_messages", "intermediate_steps"],
+            system_message=SystemMessage(
+                content=self.prompts["agent_system_prompt"].format(tools=tool_catalog)
+            ),
+            turn_template=self.prompts["agent_turn_prompt"]
         )
         
         llm_chain = LLMChain(llm=self.llm, prompt=prompt)
@@ -115,69 +266,9 @@ class ShaymeeAgent:
         return AgentExecutor.from_agent_and_tools(
             agent=agent,
             tools=self.tools,
-            verbose=True,
-            memory=self.memory
+            verbose=True
         )
     
-    def _load_prompts(self) -> Dict[str, str]:
-        """Load prompt templates"""
-        return {
-            "agent_prompt": """You are Shaymee, a friendly and helpful AI assistant for an online store in Costa Rica. You help customers find products, make purchases, and track their orders.
-
-Your personality:
-- Always be polite and courteous in Spanish
-- Use "usted" form for respect
-- Be helpful and patient
-- Provide clear and concise information
-- Always mention that you're from Shaymee store
-
-Available tools:
-{tools}
-
-Current conversation:
-{chat_history}
-
-Human: {input}
-{agent_scratchpad}
-
-Assistant: Let me help you with that. I'll use the appropriate tool to assist you.""",
-            
-            "greeting_prompt": """¡Hola! Soy Shaymee, tu asistente virtual de la tienda Shaymee. 
-
-¿En qué puedo ayudarte hoy? Puedo:
-• Ayudarte a encontrar productos
-• Mostrarte nuestras categorías
-• Procesar tu compra
-• Dar seguimiento a tus pedidos
-
-¿Qué te gustaría hacer?""",
-            
-            "product_search_prompt": """Basándome en tu descripción, aquí tienes algunos productos que podrían interesarte:
-
-{products}
-
-¿Te gustaría ver más detalles de algún producto o necesitas ayuda con algo más?""",
-            
-            "payment_prompt": """Perfecto, he generado tu link de pago SINPE:
-
-🔗 Link de Pago: {payment_link}
-💰 Total: ₡{amount}
-📦 Pedido: #{order_id}
-
-Una vez que realices el pago, te enviaré la confirmación y comenzaremos a procesar tu pedido.
-
-¿Necesitas ayuda con el pago?""",
-            
-            "order_confirmation_prompt": """¡Excelente! Tu pedido ha sido confirmado:
-
-📦 Pedido: #{order_id}
-✅ Estado: Confirmado
-📅 Fecha: {date}
-🚚 Envío: En proceso
-
-Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo que pueda ayudarte?"""
-        }
-    
     async def process_message(
         self,
         user_id: str,
@@ -191,12 +282,9 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
             if not session_id:
                 session_id = str(uuid.uuid4())
             
-            # Add context to message
-            if context:
-                message = f"Context: {json.dumps(context)}\nUser message: {message}"
-            
-            # Process with agent
-            response = await self.agent_executor.arun(message)
+            # Process with agent, replaying this user's history
+            inputs = await self._agent_inputs(user_id, message, context)
+            response = await self._run_agent(**inputs)
             
             # Store conversation
             await self.conversation_manager.store_conversation(
@@ -209,7 +297,7 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
             return {
                 "response": response,
                 "session_id": session_id,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": now_iso()
             }
             
         except Exception as e:
@@ -220,6 +308,57 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
                 "error": str(e)
             }
     
+    async def stream_message(
+        self,
+        user_id: str,
+        message: str,
+        session_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[str]:
+        """
+        Process a user message, yielding the final answer token by token.
+        
+        The conversation is stored once the stream ends; if the consumer goes
+        away mid-stream, the partial answer is stored instead.
+        """
+        if not session_id:
+            session_id = str(uuid.uuid4())
+        
+        handler = AsyncFinalIteratorCallbackHandler(answer_prefix_tokens=["Final", " Answer", ":"])
+        inputs = await self._agent_inputs(user_id, message, context)
+        task = asyncio.create_task(self._run_agent(**inputs, callbacks=[handler]))
+        # Stop iterating if the agent fails before reaching its final answer
+        task.add_done_callback(lambda _: handler.done.set())
+        
+        chunks: List[str] = []
+        try:
+            async for token in handler.aiter():
+                chunks.append(token)
+                yield token
+            response = await task
+            if not chunks:
+                # The answer prefix was never streamed (e.g. an unparsed reply)
+                chunks.append(response)
+                yield response
+        except Exception as e:
+            logger.error(f"Error streaming message: {str(e)}")
+            if not chunks:
+                fallback = "Lo siento, tuve un problema procesando tu mensaje. ¿Podrías intentarlo de nuevo?"
+                chunks.append(fallback)
+                yield fallback
+        finally:
+            if not task.done():
+                task.cancel()
+            try:
+                await self.conversation_manager.store_conversation(
+                    user_id=user_id,
+                    message=message,
+                    response="".join(chunks),
+                    session_id=session_id
+                )
+            except Exception as e:
+                logger.error(f"Error storing streamed conversation: {str(e)}")
+    
     async def create_order(
         self,
         user_id: str,
@@ -232,7 +371,7 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
             order_id = str(uuid.uuid4())
             
             # Calculate total
-            total = sum(product.get("price", 0) for product in products)
+            total = sum(product.get("price", 0) * product.get("quantity", 1) for product in products)
             
             # Create order in database
             order_data = {
@@ -243,10 +382,10 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
                 "shipping_address": shipping_address,
                 "payment_method": payment_method,
                 "status": "pending_payment",
-                "created_at": datetime.now().isoformat()
+                "created_at": now_iso()
             }
             
-            # Store order
+            # Store order first, so a payment link never exists for an order that was not saved
             await self._store_order(order_data)
             
             # Generate payment link
@@ -269,69 +408,80 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
             raise e
     
     async def process_order_background(self, order_id: str):
-        """Process order in background after payment confirmation"""
-        try:
-            # Get order details
-            order = await self._get_order(order_id)
-            
-            if not order:
-                logger.error(f"Order {order_id} not found")
-                return
-            
-            # Update status to processing
-            await self._update_order_status(order_id, "processing")
-            
-            # Purchase from Temu
-            temu_order = await self.temu_client.create_order(
-                products=order["products"],
-                shipping_address=order["shipping_address"]
-            )
-            
-            # Update order with Temu reference
-            await self._update_order_temu_reference(order_id, temu_order["temu_order_id"])
-            
-            # Update status to purchased
-            await self._update_order_status(order_id, "purchased")
-            
-            # Notify user
-            await self._notify_user_order_update(order["user_id"], order_id, "purchased")
-            
-        except Exception as e:
-            logger.error(f"Error processing order {order_id}: {str(e)}")
-            await self._update_order_status(order_id, "error")
+        """Process order in background after payment confirmation (safe to retry, see process_paid_order)"""
+        await process_paid_order(self, order_id)
     
     async def get_analytics(self) -> Dict[str, Any]:
-        """Get system analytics"""
+        """Get system analytics (stale-while-revalidate over the last computed summary)"""
         try:
-            # Get conversation stats
-            conversation_stats = await self.conversation_manager.get_stats()
+            if self._analytics is not None:
+                # Serve the cached summary; once expired, refresh it without making the caller wait
+                if self._analytics[0] <= time.monotonic():
+                    self._refresh_analytics()
+                return self._analytics[1]
             
-            # Get order stats
-            order_stats = await self._get_order_stats()
-            
-            # Get product stats
-            product_stats = await self.product_search.get_stats()
-            
-            return {
-                "conversations": conversation_stats,
-                "orders": order_stats,
-                "products": product_stats,
-                "timestamp": datetime.now().isoformat()
-            }
+            return await asyncio.shield(self._refresh_analytics())
             
         except Exception as e:
             logger.error(f"Error getting analytics: {str(e)}")
             return {"error": str(e)}
     
+    def _refresh_analytics(self) -> asyncio.Task:
+        """Start (or join) the one in-flight analytics computation"""
+        if self._analytics_refresh is None or self._analytics_refresh.done():
+            self._analytics_refresh = asyncio.ensure_future(self._compute_analytics())
+            # Background refreshes are never awaited; the error is already logged
+            self._analytics_refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._analytics_refresh
+    
+    async def _compute_analytics(self) -> Dict[str, Any]:
+        try:
+            # Conversation, order and product stats are independent; fetch them concurrently
+            conversation_stats, order_stats, product_stats = await asyncio.gather(
+                self.conversation_manager.get_stats(),
+                self._get_order_stats(),
+                self.product_search.get_stats()
+            )
+        except Exception as e:
+            # Keep serving the previous summary; the next expired read retries
+            logger.error(f"Error refreshing analytics: {str(e)}")
+            raise
+        
+        analytics = {
+            "conversations": conversation_stats,
+            "orders": order_stats,
+            "products": product_stats,
+            "timestamp": now_iso()
+        }
+        self._analytics = (time.monotonic() + _ANALYTICS_TTL, analytics)
+        return analytics
+    
     # Tool functions
     async def _search_products_tool(self, query: str) -> str:
         """Search products tool"""
         try:
-            products = await self.product_search.search(query=query, limit=5)
+            products = await self._cached_search(query)
             return f"Found {len(products)} products: {json.dumps(products, indent=2)}"
         except Exception as e:
             return f"Error searching products: {str(e)}"
     
+    async def _cached_search(self, query: str) -> List[Dict[str, Any]]:
+        """Search products, reusing recent results for the same normalized query"""
+        key = " ".join(query.lower().split())
+        now = time.monotonic()
+        
+        cached = self._search_cache.get(key)
+        if cached is not None and cached[0] > now:
+            self._search_cache.move_to_end(key)
+            return cached[1]
+        
+        products = await self.product_search.search(query=query, limit=5)
+        self._search_cache[key] = (now + _SEARCH_CACHE_TTL, products)
+        self._search_cache.move_to_end(key)
+        if len(self._search_cache) > _SEARCH_CACHE_SIZE:
+            self._search_cache.popitem(last=False)
+        return products
+    
     async def _get_categories_tool(self) -> str:
         """Get categories tool"""
         try:
@@ -377,19 +527,54 @@ Te mantendremos informado sobre el estado de tu pedido. ¿Hay algo más en lo qu
         except Exception as e:
             return f"Error getting user info: {str(e)}"
     
+    async def _run_agent(self, **kwargs: Any) -> str:
+        """Run the agent executor within the OpenAI concurrency cap"""
+        async with self._llm_semaphore:
+            return await self.agent_executor.arun(**kwargs)
+    
+    async def _agent_inputs(
+        self,
+        user_id: str,
+        message: str,
+        context: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """Build the agent executor inputs for one user turn"""
+        # Context travels as its own system message; the human turn is only the user's text
+        context_messages = [SystemMessage(content=f"Context: {_context_json(context)}")] if context else []
+        return {
+            "input": message,
+            "chat_history": await self._load_chat_history(user_id),
+            "context_messages": context_messages
+        }
+    
+    async def _load_chat_history(self, user_id: str) -> List[BaseMessage]:
+        """Load the user's recent turns from ConversationManager as chat messages"""
+        try:
+            conversations = await self.conversation_manager.get_user_conversations(
+                user_id=user_id,
+                limit=_HISTORY_LIMIT
+            )
+        except Exception as e:
+            logger.warning(f"Could not load chat history for {user_id}: {str(e)}")
+            return []
+        
+        messages: List[BaseMessage] = []
+        for turn in sorted(conversations or [], key=lambda c: str(c.get("created_at", ""))):
+            messages.append(HumanMessage(content=str(turn.get("message", ""))[:_HISTORY_MAX_CHARS]))
+            messages.append(AIMessage(content=str(turn.get("response", ""))[:_HISTORY_MAX_CHARS]))
+        return messages
+    
     def _parse_agent_output(self, text: str) -> Union[AgentAction, AgentFinish]:
         """Parse agent output"""
-        if "Final Answer:" in text:
-            return AgentFinish(
-                return_values={"output": text.split("Final Answer:")[-1].strip()},
-                log=text
-            )
+        _, found, answer = text.rpartition("Final Answer:")
+        if found:
+            return AgentFinish(return_values={"output": answer.strip()}, log=text)
         
         # Parse tool usage
-        if "Action:" in text and "Action Input:" in text:
-            action = text.split("Action:")[1].split("\n")[0].strip()
-            action_input = text.split("Action Input:")[1].split("\n")[0].strip()
-            return AgentAction(tool=action, tool_input=action_input, log=text)
+        match = _ACTION_RE.search(text)
+        if match:
+            action, action_input = match.groups()
+            return AgentAction(tool=action.strip(), tool_input=action_input.strip(), log=text)
         
         return AgentFinish(return_values={"output": text}, log=text)
     
@@ -0,0 +1,21 @@
+import time
+from datetime import datetime
+from typing import Tuple
+
+# (second, ISO string) of the last timestamp formatted by now_iso()
+_now_iso_cache: Tuple[int, str] = (0, "")
+
+
+def now_iso() -> str:
+    """
+    Current local time as an ISO-8601 string with second precision.
+
+    Formatting is cached for the current wall-clock second, so hot paths
+    only pay for a time.time() call on most invocations.
+    """
+    global _now_iso_cache
+    now = time.time()
+    second = int(now)
+    if _now_iso_cache[0] != second:
+        _now_iso_cache = (second, datetime.fromtimestamp(second).isoformat(timespec="seconds"))
+    return _now_iso_cache[1]
@@ -0,0 +1,97 @@
+import asyncio
+from typing import Optional, Any, List, Tuple
+from loguru import logger
+
+# Embeddings need numpy and a local sentence-transformers model
+try:
+    import numpy as np  # type: ignore
+    from sentence_transformers import SentenceTransformer  # type: ignore
+    HAS_EMBEDDINGS = True
+except Exception:
+    HAS_EMBEDDINGS = False
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batches concurrent embedding requests into one model forward pass.
+
+    - Callers `await embed(text)`; requests are queued with a future
+    - A background task waits up to `max_wait` seconds for more requests, then
+      encodes up to `max_batch` texts in a single `model.encode` call
+    - Vectors are L2-normalized float32 arrays, so a dot product is cosine similarity
+    - The model loads lazily on the first batch, off the event loop
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L12-v2",
+        max_batch: int = 32,
+        max_wait: float = 0.015,
+    ):
+        self.model_name = model_name
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._model = None
+        # Async state, bound lazily to the running event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_task: Optional[asyncio.Task] = None
+        self._worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def embed(self, text: str) -> Any:
+        """
+        Embed one text, sharing a forward pass with concurrent callers.
+        """
+        self._ensure_worker()
+        done = self._worker_loop.create_future()
+        self._queue.put_nowait((text, done))
+        return await done
+
+    async def aclose(self) -> None:
+        """
+        Stop the background worker (pending requests fail with CancelledError).
+        """
+        if self._worker_task is not None:
+            self._worker_task.cancel()
+            try:
+                await self._worker_task
+            except asyncio.CancelledError:
+                pass
+            self._worker_task = None
+
+    # -----------------------
+    # Internal helpers
+    # -----------------------
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._worker_loop is loop and self._worker_task is not None and not self._worker_task.done():
+            return
+        self._queue = asyncio.Queue()
+        self._worker_loop = loop
+        self._worker_task = loop.create_task(self._worker())
+
+    async def _worker(self) -> None:
+        queue = self._queue
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+            # Give concurrent callers a moment to join this batch
+            await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                vectors = await asyncio.to_thread(self._encode, [text for text, _ in batch])
+            except Exception as e:
+                logger.error(f"Error embedding batch of {len(batch)}: {e}")
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for (_, done), vector in zip(batch, vectors):
+                    if not done.done():
+                        done.set_result(vector)
+
+    def _encode(self, texts: List[str]) -> Any:
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        vectors = self._model.encode(texts, batch_size=self.max_batch, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
@@ -0,0 +1,23 @@
+import asyncio
+
+
+async def acquire_within(semaphore: asyncio.Semaphore, timeout: float) -> bool:
+    """
+    Acquire `semaphore` within `timeout` seconds; False if it timed out.
+
+    The permit is never leaked: the acquire runs as its own task, so when the
+    wait times out or the caller is cancelled it is either cancelled before
+    it got the permit (acquire() passes the permit on) or it already holds it,
+    in which case the permit is kept (timeout) or released (cancellation).
+    """
+    acquire = asyncio.ensure_future(semaphore.acquire())
+    try:
+        await asyncio.wait_for(asyncio.shield(acquire), timeout)
+        return True
+    except asyncio.TimeoutError:
+        # cancel() is False only if the acquire finished first, i.e. the permit is ours
+        return not acquire.cancel()
+    except asyncio.CancelledError:
+        if not acquire.cancel():
+            semaphore.release()
+        raise
@@ -0,0 +1,64 @@
+from typing import Any
+from loguru import logger
+
+
+async def process_paid_order(agent: Any, order_id: str) -> None:
+    """
+    Buy a paid order from Temu and notify the customer.
+
+    `agent` provides the order storage helpers (`_get_order`,
+    `_update_order_status`, `_update_order_temu_reference`), `temu_client`
+    and `_notify_user_order_update`; see ShaymeeAgent.process_order_background.
+
+    Raises on failure so the task queue can retry it. Retries never buy twice:
+    - a "purchased" order skips the Temu purchase (only the notification is retried)
+      and is never downgraded by a later failure
+    - an order left "processing" (a previous attempt reached Temu without
+      recording the outcome) is set aside for manual review
+    - only failures before the purchase starts mark the order "error"
+    """
+    stage = "before_purchase"
+    try:
+        # Get order details
+        order = await agent._get_order(order_id)
+        
+        if not order:
+            logger.error(f"Order {order_id} not found")
+            return
+        
+        status = order.get("status")
+        if status == "processing":
+            logger.error(f"Order {order_id} was left mid-purchase, needs manual review")
+            await agent._update_order_status(order_id, "needs_review")
+            return
+        
+        if status == "purchased":
+            stage = "purchased"
+        else:
+            # Update status to processing
+            await agent._update_order_status(order_id, "processing")
+            stage = "purchasing"
+            
+            # Purchase from Temu
+            temu_order = await agent.temu_client.create_order(
+                products=order["products"],
+                shipping_address=order["shipping_address"]
+            )
+            
+            # Update order with Temu reference
+            await agent._update_order_temu_reference(order_id, temu_order["temu_order_id"])
+            
+            # Update status to purchased
+            await agent._update_order_status(order_id, "purchased")
+            stage = "purchased"
+        
+        # Notify user
+        await agent._notify_user_order_update(order["user_id"], order_id, "purchased")
+        
+    except Exception as e:
+        logger.error(f"Error processing order {order_id}: {str(e)}")
+        # Mid-purchase failures keep "processing" and purchased orders stay "purchased",
+        # so a retry never buys again
+        if stage == "before_purchase":
+            await agent._update_order_status(order_id, "error")
+        raise
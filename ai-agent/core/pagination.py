@@ -0,0 +1,46 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+Row = Dict[str, Any]
+
+
+async def fetch_page(
+    fetch: Callable[..., Awaitable[Optional[List[Row]]]],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Row], Optional[str]]:
+    """
+    Load one newest-first page of rows older than `cursor`.
+
+    `fetch(limit=, before=)` is the storage query (created_at < before ORDER BY
+    created_at DESC LIMIT limit), so only one page is ever loaded. Rows at or
+    after the cursor are dropped as well, so a store that ignores `before`
+    ends the listing instead of repeating the same page forever.
+
+    Returns the rows and the cursor for the next-older page (None on the last).
+    """
+    rows = await fetch(limit=limit, before=cursor) or []
+    if cursor is not None:
+        rows = [r for r in rows if str(r.get("created_at", "")) < cursor]
+    next_cursor = str(rows[-1].get("created_at", "")) if len(rows) == limit else None
+    return rows, next_cursor
+
+
+async def stream_page(
+    rows: List[Row],
+    next_cursor: Optional[str],
+    dumps: Callable[[Any], bytes],
+    chunk_size: int = 200,
+) -> AsyncIterator[bytes]:
+    """
+    Encode a page as `{"success":true,"next_cursor":...,"conversations":[...]}`
+    in chunks, yielding between them so a long page never blocks the loop.
+    """
+    yield b'{"success":true,"next_cursor":' + dumps(next_cursor) + b',"conversations":['
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        prefix = b"," if start else b""
+        yield prefix + b",".join(dumps(r) for r in chunk)
+        await asyncio.sleep(0)
+    yield b"]}"
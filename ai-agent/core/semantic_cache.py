@@ -0,0 +1,197 @@
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Optional, Any, List, Tuple
+from loguru import logger
+
+from .embedding_batcher import EmbeddingBatcher, HAS_EMBEDDINGS
+
+# numpy and a local embedding model are needed for similarity lookups;
+# without them the cache still serves exact repeats of a prompt
+if HAS_EMBEDDINGS:
+    import numpy as np  # type: ignore
+
+
+# Prompts about specific orders, payments or shipments (any digits, IDs like
+# ORD-123 or RR123456789CR, or status keywords) need live data and are never cached;
+# near-identical embeddings cannot tell ORD-123 from ORD-124
+_LIVE_DATA_RE = re.compile(
+    r"\d|pedido|orden|order|pago|pay|env[ií]o|rastre|track|seguimiento|estado|status",
+    re.IGNORECASE,
+)
+
+
+def is_cacheable(prompt: str) -> bool:
+    return _LIVE_DATA_RE.search(prompt) is None
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _prompt_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SemanticCache:
+    """
+    In-process cache of agent responses keyed by prompt meaning.
+
+    - Entries are namespaced (e.g. per user) so answers never leak across users
+    - Prompts that mention orders, payments, tracking or any number are never
+      cached (see `is_cacheable`), since their answers depend on live data
+    - Exact repeats of a normalized prompt hit by hash, without embedding anything
+    - Otherwise the prompt is embedded locally and matched against the
+      namespace's entries by cosine similarity >= threshold; concurrent prompts
+      are embedded together through an EmbeddingBatcher
+    - Each namespace keeps at most `max_entries` entries (LRU), each living `ttl` seconds;
+      at most `max_namespaces` namespaces are kept (LRU), and expired entries are
+      swept across all namespaces every `sweep_interval` seconds
+    """
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L12-v2",
+        threshold: Optional[float] = None,
+        ttl: int = 300,
+        max_entries: int = 64,
+        max_namespaces: int = 10_000,
+        sweep_interval: float = 60,
+        batcher: Optional[EmbeddingBatcher] = None,
+    ):
+        self.model_name = model_name
+        self.batcher = batcher or EmbeddingBatcher(model_name)
+        self.threshold = threshold if threshold is not None else float(
+            os.getenv("CACHE_SIMILARITY_THRESHOLD", "0.95")
+        )
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_namespaces = max_namespaces
+        self.sweep_interval = sweep_interval
+        # namespace (LRU) -> prompt hash -> (expires_at, unit embedding or None, response)
+        self._entries: "OrderedDict[str, OrderedDict[str, Tuple[float, Any, Any]]]" = OrderedDict()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    # -----------------------
+    # Public API
+    # -----------------------
+
+    async def get(self, namespace: str, prompt: str) -> Optional[Any]:
+        """
+        Return a cached response for `prompt`, or None on a miss.
+        
+        Fails open: any error while looking up is logged and treated as a miss.
+        """
+        try:
+            return await self._get(namespace, prompt)
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed in {namespace}: {str(e)}")
+            return None
+
+    async def set(self, namespace: str, prompt: str, response: Any) -> None:
+        """
+        Store `response` as the answer to `prompt` within `namespace`.
+        
+        Fails open: any error while storing is logged and the response is not cached.
+        """
+        try:
+            await self._set(namespace, prompt, response)
+        except Exception as e:
+            logger.warning(f"Semantic cache store failed in {namespace}: {str(e)}")
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        if namespace is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(namespace, None)
+
+    # -----------------------
+    # Internal helpers
+    # -----------------------
+
+    async def _get(self, namespace: str, prompt: str) -> Optional[Any]:
+        if not is_cacheable(prompt):
+            return None
+        entries = self._entries.get(namespace)
+        if not entries:
+            return None
+        self._evict_expired(entries)
+
+        text = _normalize(prompt)
+        key = _prompt_hash(text)
+        hit = entries.get(key)
+        if hit is not None:
+            entries.move_to_end(key)
+            return hit[2]
+
+        if not HAS_EMBEDDINGS or not entries:
+            return None
+        vector = await self._embed(text)
+        if vector is None:
+            return None
+        best_key, best_score = None, -1.0
+        for entry_key, (_, embedding, _) in entries.items():
+            if embedding is None:
+                continue
+            score = float(np.dot(vector, embedding))
+            if score > best_score:
+                best_key, best_score = entry_key, score
+        if best_key is None or best_score < self.threshold:
+            return None
+        entries.move_to_end(best_key)
+        logger.debug(f"Semantic cache hit in {namespace} (similarity {best_score:.3f})")
+        return entries[best_key][2]
+
+    async def _set(self, namespace: str, prompt: str, response: Any) -> None:
+        if not is_cacheable(prompt):
+            return
+        text = _normalize(prompt)
+        # Without an embedding the entry still serves exact repeats
+        embedding = await self._embed(text) if HAS_EMBEDDINGS else None
+        now = time.monotonic()
+        if now >= self._next_sweep:
+            self._sweep(now)
+        
+        entries = self._entries.get(namespace)
+        if entries is None:
+            entries = self._entries[namespace] = OrderedDict()
+            while len(self._entries) > self.max_namespaces:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(namespace)
+        key = _prompt_hash(text)
+        entries[key] = (now + self.ttl, embedding, response)
+        entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    async def _embed(self, text: str) -> Optional[Any]:
+        """
+        Embed `text` through the batcher, or None if its batch failed.
+        
+        One failed batch rejects every prompt waiting in it; each of them is
+        treated as a miss instead of failing its request.
+        """
+        try:
+            return await self.batcher.embed(text)
+        except Exception as e:
+            logger.warning(f"Embedding failed, treating as a cache miss: {str(e)}")
+            return None
+
+    def _sweep(self, now: float) -> None:
+        """Drop expired entries in every namespace, and namespaces left empty"""
+        self._next_sweep = now + self.sweep_interval
+        for namespace in list(self._entries):
+            entries = self._entries[namespace]
+            self._evict_expired(entries)
+            if not entries:
+                del self._entries[namespace]
+
+    @staticmethod
+    def _evict_expired(entries: "OrderedDict[str, Tuple[float, Any, Any]]") -> None:
+        now = time.monotonic()
+        expired: List[str] = [key for key, (expires_at, _, _) in entries.items() if expires_at <= now]
+        for key in expired:
+            del entries[key]
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlightCache:
+    """
+    TTL cache that collapses concurrent misses for the same key into one call.
+
+    - A fresh cached value is returned without calling `fetch`
+    - On a miss, the first caller starts `fetch()`; concurrent callers for the
+      same key await that same task instead of issuing their own upstream call
+    - Failures are not cached, so the next caller retries
+    - At most `max_entries` values are kept (least recently used are dropped)
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._values: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    async def get(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._values.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            self._values.move_to_end(key)
+            return cached[1]
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._store(key, t))
+        # Shield so one caller going away does not cancel the shared fetch
+        return await asyncio.shield(task)
+
+    def _store(self, key: Hashable, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._values[key] = (time.monotonic() + self.ttl, task.result())
+        self._values.move_to_end(key)
+        while len(self._values) > self.max_entries:
+            self._values.popitem(last=False)
@@ -1,10 +1,19 @@
 import os
+import re
+import asyncio
 import json
 import csv
-from datetime import datetime
-from typing import Optional, Dict, Any, List
+import mmap
+import struct
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List, Tuple
 from loguru import logger
 
+from .clock import now_iso
+
 # Try to use a POSIX file lock for cross-process safety (macOS/Linux)
 try:
     import fcntl  # type: ignore
@@ -12,29 +21,137 @@ try:
 except Exception:
     HAS_FCNTL = False
 
+# orjson parses JSONL records considerably faster when installed
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+
+def _loads(data: bytes) -> Any:
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+
+# Binary counter layout: date as YYYYMMDD, then the sequence number
+_COUNTER_STRUCT = struct.Struct("<QQ")
+
+# Async writer batching: wait this long for more tickets, cap batch size (< IOV_MAX)
+_BATCH_WINDOW = 0.001
+_MAX_BATCH = 256
+
+_fdatasync = getattr(os, "fdatasync", os.fsync)
+
+# CSV row template (csv module's default dialect: comma, CRLF, minimal quoting)
+_CSV_ROW = "{},{},{},{},{},{},{},{}\r\n".format
+_CSV_NEEDS_QUOTING = re.compile(r'[,"\r\n]')
+
+
+# Record keys written before "metadata", which is always the last key in a JSONL line
+_JSONL_HEAD_FIELDS = ("ticket_id", "date", "seq", "created_at", "user_id", "subject", "channel")
+
+
+class _FileLock:
+    """
+    Reusable exclusive lock: a thread lock plus flock on a persistent descriptor.
+
+    flock locks belong to the open file description, so threads sharing the
+    descriptor are serialized by the thread lock first. The descriptor is
+    reopened after a fork so a child never shares its parent's lock.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd: Optional[int] = None
+        self._pid = 0
+
+    def __enter__(self) -> "_FileLock":
+        self._thread_lock.acquire()
+        if not HAS_FCNTL:
+            return self
+        try:
+            if self._pid != os.getpid():
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                self._pid = os.getpid()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            if HAS_FCNTL and self._fd is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except Exception:
+            pass
+        finally:
+            self._thread_lock.release()
+        return False
+
+    def close(self) -> None:
+        with self._thread_lock:
+            if self._fd is not None and self._pid == os.getpid():
+                os.close(self._fd)
+            self._fd = None
+            self._pid = 0
+
+
+def _csv_field(value: Any) -> str:
+    if value is None:
+        return ""
+    text = value if isinstance(value, str) else str(value)
+    if _CSV_NEEDS_QUOTING.search(text):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
 
 class TicketManager:
     """
     Simple ticket numbering and registry with daily counter reset.
 
     - Generates sequential ticket IDs of the form: TKT-YYYYMMDD-0001
-    - Persists a daily counter to disk
+    - Persists a daily counter in a 16-byte memory-mapped file, mirrored to
+      ticket_counter.json on close for humans and tooling
     - Logs created tickets to CSV and JSONL for auditing/search
-    - Uses file locking (fcntl) when available to handle concurrent writers
+    - Uses file locking (fcntl) when available to handle concurrent writers,
+      on a lock descriptor held open for the manager's lifetime
+    - Keeps the CSV/JSONL logs open in append mode so each ticket costs a
+      single write per file instead of an open/write/close cycle
+    - Maintains an append-only index (tickets.idx) of JSONL byte offsets so
+      lookups read a single record instead of scanning the whole log
+    - acreate_ticket coalesces concurrent tickets into one writev per file
     """
 
     def __init__(self, data_dir: str = "ai-agent/data", prefix: str = "TKT"):
         self.data_dir = data_dir
         self.prefix = prefix
+        # Precompiled "<prefix>-<date>-<seq:04d>" formatter
+        escaped_prefix = prefix.replace("{", "{{").replace("}", "}}")
+        self._format_ticket_id = (escaped_prefix + "-{}-{:04d}").format
+        # Cached (date string, epoch time at which it stops being valid)
+        self._today_cache = ("", 0.0)
         self.counter_path = os.path.join(self.data_dir, "ticket_counter.json")
+        self.counter_bin_path = os.path.join(self.data_dir, "ticket_counter.bin")
         self.csv_path = os.path.join(self.data_dir, "tickets.csv")
         self.jsonl_path = os.path.join(self.data_dir, "tickets.jsonl")
+        self.index_path = os.path.join(self.data_dir, "tickets.idx")
         self.lock_path = os.path.join(self.data_dir, "tickets.lock")
 
         os.makedirs(self.data_dir, exist_ok=True)
+        self._file_lock = _FileLock(self.lock_path)
+        # Map the binary counter, seeding it from the JSON mirror on first use
+        self._counter_fd = os.open(self.counter_bin_path, os.O_RDWR | os.O_CREAT, 0o644)
+        with self._locked_section():
+            is_new = os.fstat(self._counter_fd).st_size < _COUNTER_STRUCT.size
+            if is_new:
+                os.ftruncate(self._counter_fd, _COUNTER_STRUCT.size)
+            self._counter_mm = mmap.mmap(self._counter_fd, _COUNTER_STRUCT.size)
+            if is_new:
+                self._write_counter(self._read_counter_json())
+
         # Ensure files exist
-        if not os.path.exists(self.counter_path):
-            self._write_counter({"date": self._today_str(), "seq": 0})
 
         if not os.path.exists(self.csv_path):
             with open(self.csv_path, "w", newline="", encoding="utf-8") as f:
@@ -57,6 +174,26 @@ class TicketManager:
             with open(self.jsonl_path, "w", encoding="utf-8") as _:
                 pass  # just create the file
 
+        # Persistent append-only descriptors for the audit logs
+        self._csv_fd = os.open(self.csv_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._jsonl_fd = os.open(self.jsonl_path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+
+        # Offset index: ticket_id -> (offset, length), date -> [(offset, length)]
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._index_by_date: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._index_pos = 0  # bytes of tickets.idx already loaded
+        if not os.path.exists(self.index_path):
+            with self._locked_section():
+                if not os.path.exists(self.index_path):
+                    self._rebuild_index()
+        self._idx_fd = os.open(self.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+        # Async state, bound lazily to the running event loop
+        self._async_lock: Optional[asyncio.Lock] = None
+        self._write_queue: Optional[asyncio.Queue] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._writer_loop: Optional[asyncio.AbstractEventLoop] = None
+
     # -----------------------
     # Public API
     # -----------------------
@@ -72,38 +209,80 @@ class TicketManager:
         Create a new ticket, incrementing the daily counter and persisting the record.
         """
         with self._locked_section():
-            counter = self._read_counter()
-            today = self._today_str()
-
-            if counter.get("date") != today:
-                # Reset counter for a new day
-                logger.info(f"Resetting ticket counter for new day: {today}")
-                counter = {"date": today, "seq": 0}
-
-            counter["seq"] += 1
-            self._write_counter(counter)
-
-            ticket_id = f"{self.prefix}-{today}-{counter['seq']:04d}"
-            created_at = datetime.now().isoformat()
-
-            record: Dict[str, Any] = {
-                "ticket_id": ticket_id,
-                "date": today,
-                "seq": counter["seq"],
-                "created_at": created_at,
-                "user_id": user_id,
-                "subject": subject,
-                "channel": channel,
-                "metadata": metadata or {},
-            }
-
+            record = self._allocate_record(user_id, subject, channel, metadata)
+            csv_row, jsonl_line = self._serialize(record)
             # Persist to CSV
-            self._append_csv(record)
+            self._append_csv(csv_row)
             # Persist to JSONL
-            self._append_jsonl(record)
+            self._append_jsonl(record, jsonl_line)
 
-            logger.info(f"Created ticket {ticket_id}")
-            return record
+        logger.info(f"Created ticket {record['ticket_id']}")
+        return record
+
+    async def acreate_ticket(
+        self,
+        user_id: Optional[str] = None,
+        subject: Optional[str] = None,
+        channel: Optional[str] = "whatsapp",
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Async variant of create_ticket for use from the event loop.
+
+        The ticket number is allocated under the lock in a worker thread; the
+        CSV/JSONL writes are handed to a background writer that flushes
+        queued tickets in batches.
+        """
+        self._ensure_writer()
+        async with self._async_lock:
+            record = await asyncio.to_thread(
+                self._allocate_locked, user_id, subject, channel, metadata
+            )
+        done = self._writer_loop.create_future()
+        self._write_queue.put_nowait((record, done))
+        await done
+
+        logger.info(f"Created ticket {record['ticket_id']}")
+        return record
+
+    async def aclose(self) -> None:
+        """
+        Flush tickets queued by acreate_ticket, stop the writer and close files.
+        """
+        if self._write_queue is not None:
+            await self._write_queue.join()
+        if self._writer_task is not None:
+            self._writer_task.cancel()
+            try:
+                await self._writer_task
+            except asyncio.CancelledError:
+                pass
+            self._writer_task = None
+        self.close()
+
+    def close(self) -> None:
+        """
+        Release the persistent log file descriptors and mirror the counter to JSON.
+        """
+        mm = getattr(self, "_counter_mm", None)
+        if mm is not None:
+            try:
+                self._write_counter_json(self._read_counter())
+            except Exception as e:
+                logger.error(f"Error writing counter mirror: {e}")
+            mm.close()
+            self._counter_mm = None
+        for attr in ("_csv_fd", "_jsonl_fd", "_idx_fd", "_counter_fd"):
+            fd = getattr(self, attr, None)
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+                setattr(self, attr, None)
+        file_lock = getattr(self, "_file_lock", None)
+        if file_lock is not None:
+            file_lock.close()
 
     def get_counter(self) -> Dict[str, Any]:
         """
@@ -112,7 +291,7 @@ class TicketManager:
         counter = self._read_counter()
         date = counter.get("date", self._today_str())
         seq = int(counter.get("seq", 0))
-        last_ticket_id = f"{self.prefix}-{date}-{seq:04d}" if seq > 0 else None
+        last_ticket_id = self._format_ticket_id(date, seq) if seq > 0 else None
         return {
             "date": date,
             "seq": seq,
@@ -126,79 +305,251 @@ class TicketManager:
         Returns up to `limit` most recent tickets for that date.
         """
         date_str = date or self._today_str()
-        results: List[Dict[str, Any]] = []
+        results: List[Tuple[int, Dict[str, Any]]] = []
         try:
-            # Read JSONL and filter by date
-            with open(self.jsonl_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                        if obj.get("date") == date_str:
-                            results.append(obj)
-                    except Exception:
-                        continue
-            # Return most recent first
-            results.sort(key=lambda x: (x.get("date", ""), int(x.get("seq", 0))), reverse=True)
-            return results[:limit]
+            self._refresh_index()
+            for offset, length in self._index_by_date.get(date_str, ()):
+                try:
+                    obj = _loads(self._read_at(offset, length))
+                    results.append((int(obj.get("seq", 0)), obj))
+                except Exception:
+                    continue
+            # Return most recent first (all entries share the requested date)
+            results.sort(key=lambda x: x[0], reverse=True)
+            return [obj for _, obj in results[:limit]]
         except FileNotFoundError:
             return []
 
     def get_ticket(self, ticket_id: str) -> Optional[Dict[str, Any]]:
         """
-        Retrieve a single ticket by ID by scanning JSONL (sufficient for modest volumes).
+        Retrieve a single ticket by ID using the offset index.
         """
         try:
-            with open(self.jsonl_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    try:
-                        obj = json.loads(line)
-                        if obj.get("ticket_id") == ticket_id:
-                            return obj
-                    except Exception:
-                        continue
+            self._refresh_index()
+            entry = self._index.get(ticket_id)
+            if entry is None:
+                return None
+            return _loads(self._read_at(*entry))
         except FileNotFoundError:
             return None
-        return None
+        except Exception as e:
+            logger.error(f"Error reading ticket {ticket_id}: {e}")
+            return None
 
     # -----------------------
     # Internal helpers
     # -----------------------
 
-    def _append_csv(self, record: Dict[str, Any]) -> None:
-        with open(self.csv_path, "a", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f,
-                fieldnames=[
-                    "ticket_id",
-                    "date",
-                    "seq",
-                    "created_at",
-                    "user_id",
-                    "subject",
-                    "channel",
-                    "metadata_json",
-                ],
-            )
-            row = {
-                "ticket_id": record["ticket_id"],
-                "date": record["date"],
-                "seq": record["seq"],
-                "created_at": record["created_at"],
-                "user_id": record.get("user_id"),
-                "subject": record.get("subject"),
-                "channel": record.get("channel"),
-                "metadata_json": json.dumps(record.get("metadata") or {}, ensure_ascii=False),
-            }
-            writer.writerow(row)
-
-    def _append_jsonl(self, record: Dict[str, Any]) -> None:
-        with open(self.jsonl_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    def _allocate_record(
+        self,
+        user_id: Optional[str],
+        subject: Optional[str],
+        channel: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        Increment the daily counter and build the ticket record. Caller holds the lock.
+        """
+        counter = self._read_counter()
+        today = self._today_str()
+
+        if counter.get("date") != today:
+            # Reset counter for a new day
+            logger.info(f"Resetting ticket counter for new day: {today}")
+            counter = {"date": today, "seq": 0}
+
+        counter["seq"] += 1
+        self._write_counter(counter)
+
+        return {
+            "ticket_id": self._format_ticket_id(today, counter["seq"]),
+            "date": today,
+            "seq": counter["seq"],
+            "created_at": now_iso(),
+            "user_id": user_id,
+            "subject": subject,
+            "channel": channel,
+            "metadata": metadata or {},
+        }
+
+    def _allocate_locked(self, *args: Any) -> Dict[str, Any]:
+        with self._locked_section():
+            return self._allocate_record(*args)
+
+    def _serialize(self, record: Dict[str, Any]) -> Tuple[bytes, bytes]:
+        """
+        Render the CSV row and JSONL line, serializing the metadata only once.
+        """
+        metadata_json = json.dumps(record["metadata"], ensure_ascii=False)
+        return self._csv_row(record, metadata_json), self._jsonl_line(record, metadata_json)
+
+    def _csv_row(self, record: Dict[str, Any], metadata_json: str) -> bytes:
+        return _CSV_ROW(
+            _csv_field(record["ticket_id"]),
+            record["date"],
+            record["seq"],
+            record["created_at"],
+            _csv_field(record.get("user_id")),
+            _csv_field(record.get("subject")),
+            _csv_field(record.get("channel")),
+            _csv_field(metadata_json),
+        ).encode("utf-8")
+
+    def _jsonl_line(self, record: Dict[str, Any], metadata_json: str) -> bytes:
+        head = json.dumps({key: record[key] for key in _JSONL_HEAD_FIELDS}, ensure_ascii=False)
+        # Splice the already rendered metadata in as the final key
+        return (head[:-1] + ', "metadata": ' + metadata_json + "}\n").encode("utf-8")
+
+    @staticmethod
+    def _index_line(ticket_id: str, offset: int, length: int, date: str) -> bytes:
+        return f"{ticket_id}\t{offset}\t{length}\t{date}\n".encode("utf-8")
+
+    def _append_csv(self, row: bytes) -> None:
+        self._write_all(self._csv_fd, row)
+
+    def _append_jsonl(self, record: Dict[str, Any], data: bytes) -> None:
+        self._write_all(self._jsonl_fd, data)
+        # O_APPEND leaves the descriptor at the end of our write; we hold the lock
+        offset = os.lseek(self._jsonl_fd, 0, os.SEEK_CUR) - len(data)
+        self._write_all(self._idx_fd, self._index_line(record["ticket_id"], offset, len(data), record["date"]))
+
+    def _flush_batch(self, records: List[Dict[str, Any]]) -> None:
+        """
+        Persist a batch of allocated tickets with one writev per file and one fdatasync.
+        """
+        rendered = [self._serialize(r) for r in records]
+        csv_rows = [csv_row for csv_row, _ in rendered]
+        jsonl_lines = [jsonl_line for _, jsonl_line in rendered]
+        with self._locked_section():
+            self._writev_all(self._csv_fd, csv_rows)
+            offset = os.lseek(self._jsonl_fd, 0, os.SEEK_END)
+            self._writev_all(self._jsonl_fd, jsonl_lines)
+            index_lines = []
+            for record, data in zip(records, jsonl_lines):
+                index_lines.append(self._index_line(record["ticket_id"], offset, len(data), record["date"]))
+                offset += len(data)
+            self._writev_all(self._idx_fd, index_lines)
+            _fdatasync(self._jsonl_fd)
+
+    def _ensure_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._writer_loop is loop and self._writer_task is not None and not self._writer_task.done():
+            return
+        self._async_lock = asyncio.Lock()
+        self._write_queue = asyncio.Queue()
+        self._writer_loop = loop
+        self._writer_task = loop.create_task(self._writer())
+
+    async def _writer(self) -> None:
+        queue = self._write_queue
+        while True:
+            batch = [await queue.get()]
+            # Give concurrent callers a moment to join this batch
+            await asyncio.sleep(_BATCH_WINDOW)
+            while len(batch) < _MAX_BATCH and not queue.empty():
+                batch.append(queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._flush_batch, [record for record, _ in batch])
+            except Exception as e:
+                logger.error(f"Error writing ticket batch: {e}")
+                for _, done in batch:
+                    if not done.done():
+                        done.set_exception(e)
+            else:
+                for _, done in batch:
+                    if not done.done():
+                        done.set_result(None)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def _writev_all(self, fd: int, chunks: List[bytes]) -> None:
+        if not hasattr(os, "writev"):
+            self._write_all(fd, b"".join(chunks))
+            return
+        written = os.writev(fd, chunks)
+        if written < sum(len(c) for c in chunks):
+            self._write_all(fd, b"".join(chunks)[written:])
+
+    def _refresh_index(self) -> None:
+        """
+        Load index entries appended since the last refresh (by this or other processes).
+        """
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_pos)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1  # ignore a partially written trailing line
+        if not end:
+            return
+        for line in chunk[:end].decode("utf-8").splitlines():
+            try:
+                ticket_id, offset, length, date = line.split("\t")
+            except ValueError:
+                continue
+            entry = (int(offset), int(length))
+            self._index[ticket_id] = entry
+            self._index_by_date[date].append(entry)
+        self._index_pos += end
+
+    def _rebuild_index(self) -> None:
+        """
+        Build tickets.idx from an existing JSONL log (e.g. data created before the index).
+        """
+        lines: List[str] = []
+        offset = 0
+        with open(self.jsonl_path, "rb") as f:
+            for raw in f:
+                # Cheap bytes check skips blank/garbage lines without parsing them
+                if b'"ticket_id"' in raw:
+                    try:
+                        obj = _loads(raw)
+                        lines.append(f"{obj['ticket_id']}\t{offset}\t{len(raw)}\t{obj.get('date', '')}\n")
+                    except Exception:
+                        pass
+                offset += len(raw)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        os.replace(tmp_path, self.index_path)
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        if hasattr(os, "pread"):
+            return os.pread(self._jsonl_fd, length, offset)
+        with open(self.jsonl_path, "rb") as f:
+            f.seek(offset)
+            return f.read(length)
+
+    @staticmethod
+    def _write_all(fd: int, data: bytes) -> None:
+        """
+        Append `data` to an O_APPEND descriptor, retrying on short writes.
+        """
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
 
     def _today_str(self) -> str:
-        return datetime.now().strftime("%Y%m%d")
+        today, valid_until = self._today_cache
+        if time.time() < valid_until:
+            return today
+        now = datetime.now()
+        today = now.strftime("%Y%m%d")
+        next_midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        self._today_cache = (today, next_midnight.timestamp())
+        return today
 
     def _read_counter(self) -> Dict[str, Any]:
+        date, seq = _COUNTER_STRUCT.unpack_from(self._counter_mm, 0)
+        if not date:
+            return {"date": self._today_str(), "seq": 0}
+        return {"date": f"{date:08d}", "seq": seq}
+
+    def _write_counter(self, counter: Dict[str, Any]) -> None:
+        _COUNTER_STRUCT.pack_into(self._counter_mm, 0, int(counter["date"]), int(counter["seq"]))
+        self._counter_mm.flush()
+
+    def _read_counter_json(self) -> Dict[str, Any]:
         try:
             with open(self.counter_path, "r", encoding="utf-8") as f:
                 return json.load(f)
@@ -208,7 +559,7 @@ class TicketManager:
             logger.error(f"Error reading counter file: {e}")
             return {"date": self._today_str(), "seq": 0}
 
-    def _write_counter(self, counter: Dict[str, Any]) -> None:
+    def _write_counter_json(self, counter: Dict[str, Any]) -> None:
         tmp_path = self.counter_path + ".tmp"
         with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(counter, f, ensure_ascii=False)
@@ -219,39 +570,8 @@ class TicketManager:
     # Locking helpers
     # -----------------------
 
-    def _locked_section(self):
+    def _locked_section(self) -> _FileLock:
         """
-        Context manager for file-based locking across processes (when fcntl is available).
-        Falls back to a dummy context manager if not supported.
+        Exclusive section across threads and, when fcntl is available, processes.
         """
-        class _Dummy:
-            def __enter__(self_nonlocal):
-                return None
-
-            def __exit__(self_nonlocal, exc_type, exc, tb):
-                return False
-
-        if not HAS_FCNTL:
-            return _Dummy()
-
-        class _FlockContext:
-            def __init__(self_outer, lock_file_path: str):
-                self_outer.lock_file_path = lock_file_path
-                self_outer._fh = None
-
-            def __enter__(self_outer):
-                # Open lock file and acquire exclusive lock
-                self_outer._fh = open(self_outer.lock_file_path, "a+")
-                fcntl.flock(self_outer._fh, fcntl.LOCK_EX)
-                return self_outer
-
-            def __exit__(self_outer, exc_type, exc, tb):
-                try:
-                    if self_outer._fh:
-                        fcntl.flock(self_outer._fh, fcntl.LOCK_UN)
-                        self_outer._fh.close()
-                except Exception:
-                    pass
-                return False
-
-        return _FlockContext(self.lock_path)
+        return self._file_lock
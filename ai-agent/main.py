@@ -1,56 +1,313 @@
-from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.security import HTTPBearer
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field, ValidationError
 from typing import List, Optional, Dict, Any
 import uvicorn
+import asyncio
+import hashlib
+import json
 import os
+import sys
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 from loguru import logger
 
+# uvloop gives the event loop cheaper task switches and I/O callbacks (not on Windows)
+try:
+    import uvloop  # type: ignore
+    HAS_UVLOOP = True
+except Exception:
+    HAS_UVLOOP = False
+
+# Prometheus metrics at /metrics when the instrumentator is installed
+try:
+    from prometheus_fastapi_instrumentator import Instrumentator  # type: ignore
+    HAS_INSTRUMENTATOR = True
+except Exception:
+    HAS_INSTRUMENTATOR = False
+
+# orjson encodes responses considerably faster than the stdlib json encoder
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
 # Load environment variables
 load_dotenv()
 
+# Log through loguru's background queue so sink I/O never blocks the event loop
+_LOG_LEVEL = os.getenv("LOG_LEVEL", "info").upper()
+logger.remove()
+logger.add(sys.stderr, level=_LOG_LEVEL, enqueue=True, backtrace=False, diagnose=False)
+logger.add(
+    os.getenv("LOG_FILE", "./logs/app.log"),
+    level=_LOG_LEVEL,
+    rotation="100 MB",
+    enqueue=True,
+    backtrace=False,
+    diagnose=False
+)
+
 # Import core modules
 from core.agent import ShaymeeAgent
 from core.product_search import ProductSearchEngine
 from core.conversation_manager import ConversationManager
 from core.payment_processor import PaymentProcessor
+from core.embedding_batcher import EmbeddingBatcher
+from core.semantic_cache import SemanticCache
+from core.single_flight import SingleFlightCache
+from core.limits import acquire_within
+from core.pagination import fetch_page, stream_page
+from core.clock import now_iso
 from integrations.temu_client import TemuClient
 from integrations.correos_client import CorreosClient
 from integrations.sinpe_client import SinpeClient
 from utils.database import get_db
 from utils.auth import verify_token
 
+# Post-response work goes to the Celery queue (see worker.py) when Redis is configured;
+# otherwise it runs in-process as FastAPI background tasks
+try:
+    from worker import store_conversation as store_conversation_task, process_order as process_order_task
+    HAS_CELERY = True
+except Exception:
+    store_conversation_task = process_order_task = None
+    HAS_CELERY = False
+USE_TASK_QUEUE = HAS_CELERY and bool(os.getenv("REDIS_URL"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build core services on startup and keep them on app.state"""
+    agent = ShaymeeAgent.instance()
+    # Opens the pooled HTTP session the integration clients share
+    await agent.startup()
+    app.state.agent = agent
+    # Per-integration cap on in-flight upstream calls
+    app.state.upstream_limits = {
+        name: asyncio.Semaphore(int(os.getenv(f"{name.upper()}_MAX_INFLIGHT", "32")))
+        for name in ("temu", "correos", "sinpe")
+    }
+    app.state.product_search = ProductSearchEngine()
+    app.state.conversation_manager = ConversationManager()
+    app.state.payment_processor = PaymentProcessor()
+    # One batcher so concurrent prompts share embedding forward passes
+    app.state.embedding_batcher = EmbeddingBatcher()
+    # Short-lived: cached answers skip the agent's conversation memory
+    app.state.response_cache = SemanticCache(
+        batcher=app.state.embedding_batcher,
+        ttl=int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+    )
+    logger.info("Shaymee services initialized")
+    try:
+        yield
+    finally:
+        await app.state.embedding_batcher.aclose()
+        await agent.aclose()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Shaymee AI Agent",
     description="AI Agent for Shaymee store with WhatsApp, Temu, and Correos de Costa Rica integration",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse if HAS_ORJSON else JSONResponse
 )
 
+# Security: every route except these needs a valid bearer token
+PUBLIC_PATHS = frozenset({"/health", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json", "/metrics"})
+
+class AuthMiddleware:
+    """
+    Pure ASGI middleware that checks the bearer token before the body is read.
+    
+    Rejected requests get a 401 without their body being parsed or validated;
+    verified user data is attached as scope["user"].
+    """
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        authorization = b""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+                break
+        scheme, _, credentials = authorization.decode("latin-1").partition(" ")
+        if scheme.lower() != "bearer" or not credentials:
+            await self._reject(send, "Not authenticated")
+            return
+        try:
+            scope["user"] = verify_token_cached(credentials.strip())
+        except Exception as e:
+            logger.warning("Rejected token for {}: {}", scope["path"], e)
+            await self._reject(send, "Invalid token")
+            return
+        await self.app(scope, receive, send)
+    
+    @staticmethod
+    async def _reject(send, detail: str):
+        body = json.dumps({"success": False, "detail": detail}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 401,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"www-authenticate", b"Bearer"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+# Token check runs inside the CORS/GZip middleware so rejections still carry CORS headers
+app.add_middleware(AuthMiddleware)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure properly for production
+    # Comma-separated allow-list, e.g. CORS_ORIGIN=https://dashboard.shaymee.com
+    allow_origins=[
+        origin.strip()
+        for origin in os.getenv("CORS_ORIGIN", "http://localhost:3000").split(",")
+        if origin.strip()
+    ],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["authorization", "content-type", "if-none-match"],
+    expose_headers=["etag"],
+    # Let browsers cache preflight responses for a day
+    max_age=86400,
 )
 
-# Security
-security = HTTPBearer()
+class StreamSafeGZipMiddleware(GZipMiddleware):
+    """GZip responses except on streaming endpoints, where it would buffer events"""
+    
+    uncompressed_paths = frozenset({"/agent/stream-message"})
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.uncompressed_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress larger JSON payloads (Temu product lists, conversation history)
+app.add_middleware(StreamSafeGZipMiddleware, minimum_size=1024)
+
+if HAS_INSTRUMENTATOR:
+    Instrumentator().instrument(app).expose(app, endpoint="/metrics", include_in_schema=False)
+
+# Unhandled errors become a 500 JSON response; HTTPException keeps FastAPI's own handling
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.exception("Error handling {} {}: {}", request.method, request.url.path, exc)
+    response_class = ORJSONResponse if HAS_ORJSON else JSONResponse
+    return response_class({"success": False, "detail": str(exc)}, status_code=500)
+
+
+# Service providers (instances are created once, in lifespan)
+def get_agent(request: Request) -> ShaymeeAgent:
+    return request.app.state.agent
+
+def get_product_search(request: Request) -> ProductSearchEngine:
+    return request.app.state.product_search
+
+def get_conversation_manager(request: Request) -> ConversationManager:
+    return request.app.state.conversation_manager
+
+def get_payment_processor(request: Request) -> PaymentProcessor:
+    return request.app.state.payment_processor
+
+def get_response_cache(request: Request) -> SemanticCache:
+    return request.app.state.response_cache
 
-# Initialize core services
-agent = ShaymeeAgent()
-product_search = ProductSearchEngine()
-conversation_manager = ConversationManager()
-payment_processor = PaymentProcessor()
-temu_client = TemuClient()
-correos_client = CorreosClient()
-sinpe_client = SinpeClient()
+# Integration clients are shared with the agent so they use its HTTP session
+def get_temu_client(request: Request) -> TemuClient:
+    return request.app.state.agent.temu_client
+
+def get_correos_client(request: Request) -> CorreosClient:
+    return request.app.state.agent.correos_client
+
+def get_sinpe_client(request: Request) -> SinpeClient:
+    return request.app.state.agent.sinpe_client
+
+# Verified tokens: blake2b(token) -> (user data, expires_at); raw tokens are not kept
+_TOKEN_CACHE_SIZE = 10_000
+_TOKEN_CACHE_TTL = 60  # seconds
+_token_cache: "OrderedDict[bytes, tuple]" = OrderedDict()
+
+def verify_token_cached(token: str) -> Any:
+    """verify_token, reusing the result for a recently seen token (never past its exp)"""
+    key = hashlib.blake2b(token.encode("utf-8"), digest_size=16).digest()
+    now = time.time()
+    cached = _token_cache.get(key)
+    if cached is not None and cached[1] > now:
+        _token_cache.move_to_end(key)
+        return cached[0]
+    
+    user_data = verify_token(token)
+    expires_at = now + _TOKEN_CACHE_TTL
+    if isinstance(user_data, dict) and isinstance(user_data.get("exp"), (int, float)):
+        expires_at = min(expires_at, user_data["exp"])
+    _token_cache[key] = (user_data, expires_at)
+    _token_cache.move_to_end(key)
+    if len(_token_cache) > _TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+    return user_data
+
+# Search results per (normalized query, category, price range, limit), kept briefly
+_SEARCH_CACHE_SIZE = 2048
+_SEARCH_CACHE_TTL = 300  # seconds
+_search_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+def _search_cache_key(request: "ProductSearchRequest") -> tuple:
+    price_range = (request.price_range.min, request.price_range.max) if request.price_range else None
+    return (" ".join(request.query.lower().split()), request.category, price_range, request.limit)
+
+# How long a request may wait for an upstream slot before getting a 503
+_UPSTREAM_QUEUE_TIMEOUT = float(os.getenv("UPSTREAM_QUEUE_TIMEOUT", "5"))
+
+async def _call_upstream(request: Request, name: str, call: Any) -> Any:
+    """Run `call()` within the integration's concurrency cap, or fail fast with 503"""
+    semaphore = request.app.state.upstream_limits[name]
+    if not await acquire_within(semaphore, _UPSTREAM_QUEUE_TIMEOUT):
+        raise HTTPException(
+            status_code=503,
+            detail=f"{name} integration is busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        return await call()
+    finally:
+        semaphore.release()
+
+# Upstream lookups shared by concurrent requests: categories for an hour, tracking for 30s
+_categories_cache = SingleFlightCache(ttl=3600, max_entries=1)
+_tracking_cache = SingleFlightCache(ttl=30, max_entries=4096)
+
+# Admin history pages hold at most this many conversations, encoded this many at a time
+_CONVERSATION_PAGE_MAX = 1000
+_CONVERSATION_CHUNK = 200
+
+def _dumps(value: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(value, default=str)
+    return json.dumps(value, default=str, ensure_ascii=False).encode("utf-8")
+
+# One /batch request may carry at most this many items, run this many at a time
+_BATCH_MAX_ITEMS = 20
+_BATCH_CONCURRENCY = 4
 
 # Pydantic models
 class MessageRequest(BaseModel):
@@ -58,11 +315,35 @@ class MessageRequest(BaseModel):
     message: str
     session_id: Optional[str] = None
     context: Optional[Dict[str, Any]] = None
+    no_cache: bool = False  # skip the response cache (e.g. sensitive prompts)
+
+class PriceRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class ShippingAddress(BaseModel):
+    # Extra keys (e.g. canton, district, directions) are kept and passed through
+    model_config = ConfigDict(extra="allow")
+    
+    line1: str
+    city: str
+    province: str
+    postal_code: Optional[str] = None
+    country: str = "CR"
+
+class OrderLine(BaseModel):
+    # Extra product details (title, url, image...) are passed through to the order;
+    # lines without a sku (older clients send name and price) are still accepted
+    model_config = ConfigDict(extra="allow")
+    
+    sku: Optional[str] = None
+    quantity: int = 1
+    price: float
 
 class ProductSearchRequest(BaseModel):
     query: str
     category: Optional[str] = None
-    price_range: Optional[Dict[str, float]] = None
+    price_range: Optional[PriceRange] = None
     limit: int = 10
 
 class PaymentRequest(BaseModel):
@@ -73,10 +354,18 @@ class PaymentRequest(BaseModel):
 
 class OrderRequest(BaseModel):
     user_id: str
-    products: List[Dict[str, Any]]
-    shipping_address: Dict[str, str]
+    products: List[OrderLine]
+    shipping_address: ShippingAddress
     payment_method: str = "sinpe"
 
+class BatchItem(BaseModel):
+    method: str = "POST"
+    path: str
+    body: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(max_length=_BATCH_MAX_ITEMS)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
@@ -87,18 +376,41 @@ async def health_check():
         "timestamp": "2024-01-01T00:00:00Z"
     }
 
-# AI Agent endpoints
-@app.post("/agent/process-message")
-async def process_message(
+async def _defer(background_tasks: BackgroundTasks, task: Any, fallback: Any, **kwargs: Any):
+    """Enqueue `task` for a worker, or run `fallback` after the response without a queue"""
+    if USE_TASK_QUEUE:
+        try:
+            await asyncio.to_thread(task.apply_async, kwargs=kwargs)
+            return
+        except Exception as e:
+            logger.warning("Task queue unavailable, running {} in-process: {}", task.name, e)
+    background_tasks.add_task(fallback, **kwargs)
+
+# AI Agent operations, shared by the endpoints below and /batch
+async def _process_message(
     request: MessageRequest,
     background_tasks: BackgroundTasks,
-    token: str = Depends(security)
-):
-    """Process user message through AI agent"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
+    agent: ShaymeeAgent,
+    conversation_manager: ConversationManager,
+    response_cache: SemanticCache
+) -> Dict[str, Any]:
+    # Context-free prompts may be answered from this user's response cache
+    use_cache = not request.no_cache and not request.context
+    cached = None
+    if use_cache:
+        # The cache is an optimization: if it fails, answer with the agent
+        try:
+            cached = await response_cache.get(request.user_id, request.message)
+        except Exception as e:
+            logger.warning("Response cache lookup failed for {}: {}", request.user_id, e)
+    if cached is not None:
+        response = {
+            "response": cached,
+            "session_id": request.session_id or str(uuid.uuid4()),
+            "timestamp": now_iso(),
+            "cached": True
+        }
+    else:
         # Process message with AI agent
         response = await agent.process_message(
             user_id=request.user_id,
@@ -106,274 +418,396 @@ async def process_message(
             session_id=request.session_id,
             context=request.context
         )
-        
-        # Store conversation in background
-        background_tasks.add_task(
-            conversation_manager.store_conversation,
+        if use_cache and "error" not in response:
+            try:
+                await response_cache.set(request.user_id, request.message, response["response"])
+            except Exception as e:
+                logger.warning("Response cache store failed for {}: {}", request.user_id, e)
+    
+    # Store conversation in background
+    await _defer(
+        background_tasks,
+        store_conversation_task,
+        conversation_manager.store_conversation,
+        user_id=request.user_id,
+        message=request.message,
+        response=response,
+        session_id=request.session_id
+    )
+    
+    return {
+        "success": True,
+        "response": response,
+        "session_id": response.get("session_id")
+    }
+
+async def _search_products(
+    request: ProductSearchRequest,
+    product_search: ProductSearchEngine
+) -> Dict[str, Any]:
+    # Search products, reusing a recent result for the same search
+    key = _search_cache_key(request)
+    cached = _search_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        _search_cache.move_to_end(key)
+        products = cached[1]
+    else:
+        products = await product_search.search(
+            query=request.query,
+            category=request.category,
+            price_range=request.price_range.model_dump(exclude_none=True) if request.price_range else None,
+            limit=request.limit
+        )
+        _search_cache[key] = (time.monotonic() + _SEARCH_CACHE_TTL, products)
+        _search_cache.move_to_end(key)
+        if len(_search_cache) > _SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
+    
+    return {
+        "success": True,
+        "products": products,
+        "total": len(products)
+    }
+
+async def _generate_payment(
+    request: PaymentRequest,
+    payment_processor: PaymentProcessor
+) -> Dict[str, Any]:
+    # Generate payment link
+    payment_link = await payment_processor.generate_payment_link(
+        order_id=request.order_id,
+        amount=request.amount,
+        currency=request.currency,
+        payment_method=request.payment_method
+    )
+    
+    return {
+        "success": True,
+        "payment_link": payment_link,
+        "order_id": request.order_id
+    }
+
+async def _create_order(
+    request: OrderRequest,
+    background_tasks: BackgroundTasks,
+    agent: ShaymeeAgent
+) -> Dict[str, Any]:
+    # Create order
+    order = await agent.create_order(
+        user_id=request.user_id,
+        products=[line.model_dump(exclude_none=True) for line in request.products],
+        shipping_address=request.shipping_address.model_dump(exclude_none=True),
+        payment_method=request.payment_method
+    )
+    
+    # Process order in background
+    await _defer(
+        background_tasks,
+        process_order_task,
+        agent.process_order_background,
+        order_id=order["order_id"]
+    )
+    
+    return {
+        "success": True,
+        "order": order
+    }
+
+# AI Agent endpoints
+@app.post("/agent/process-message")
+async def process_message(
+    request: MessageRequest,
+    background_tasks: BackgroundTasks,
+    agent: ShaymeeAgent = Depends(get_agent),
+    conversation_manager: ConversationManager = Depends(get_conversation_manager),
+    response_cache: SemanticCache = Depends(get_response_cache)
+):
+    """Process user message through AI agent"""
+    return await _process_message(
+        request, background_tasks, agent, conversation_manager, response_cache
+    )
+
+@app.post("/agent/stream-message")
+async def stream_message(
+    request: MessageRequest,
+    agent: ShaymeeAgent = Depends(get_agent)
+):
+    """Process user message through AI agent, streaming the answer as Server-Sent Events"""
+    session_id = request.session_id or str(uuid.uuid4())
+    
+    async def event_stream():
+        # The agent stores the conversation when the stream ends
+        async for chunk in agent.stream_message(
             user_id=request.user_id,
             message=request.message,
-            response=response,
-            session_id=request.session_id
-        )
-        
-        return {
-            "success": True,
-            "response": response,
-            "session_id": response.get("session_id")
-        }
-    except Exception as e:
-        logger.error(f"Error processing message: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+            session_id=session_id,
+            context=request.context
+        ):
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+        yield f"event: done\ndata: {json.dumps({'session_id': session_id})}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/agent/search-products")
 async def search_products(
     request: ProductSearchRequest,
-    token: str = Depends(security)
+    product_search: ProductSearchEngine = Depends(get_product_search)
 ):
     """Search products using AI-powered semantic search"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Search products
-        products = await product_search.search(
-            query=request.query,
-            category=request.category,
-            price_range=request.price_range,
-            limit=request.limit
-        )
-        
-        return {
-            "success": True,
-            "products": products,
-            "total": len(products)
-        }
-    except Exception as e:
-        logger.error(f"Error searching products: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _search_products(request, product_search)
 
 @app.post("/agent/generate-payment")
 async def generate_payment(
     request: PaymentRequest,
-    token: str = Depends(security)
+    payment_processor: PaymentProcessor = Depends(get_payment_processor)
 ):
     """Generate payment link using SINPE"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Generate payment link
-        payment_link = await payment_processor.generate_payment_link(
-            order_id=request.order_id,
-            amount=request.amount,
-            currency=request.currency,
-            payment_method=request.payment_method
-        )
-        
-        return {
-            "success": True,
-            "payment_link": payment_link,
-            "order_id": request.order_id
-        }
-    except Exception as e:
-        logger.error(f"Error generating payment: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return await _generate_payment(request, payment_processor)
 
 @app.post("/agent/create-order")
 async def create_order(
     request: OrderRequest,
     background_tasks: BackgroundTasks,
-    token: str = Depends(security)
+    agent: ShaymeeAgent = Depends(get_agent)
 ):
     """Create order and initiate purchase process"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Create order
-        order = await agent.create_order(
-            user_id=request.user_id,
-            products=request.products,
-            shipping_address=request.shipping_address,
-            payment_method=request.payment_method
-        )
-        
-        # Process order in background
-        background_tasks.add_task(
-            agent.process_order_background,
-            order_id=order["order_id"]
+    return await _create_order(request, background_tasks, agent)
+
+# Batch endpoint: (method, path) -> (body model, operation(body, background_tasks, app.state))
+_BATCH_ROUTES = {
+    ("POST", "/agent/process-message"): (
+        MessageRequest,
+        lambda body, tasks, state: _process_message(
+            body, tasks, state.agent, state.conversation_manager, state.response_cache
         )
-        
-        return {
-            "success": True,
-            "order": order
-        }
+    ),
+    ("POST", "/agent/search-products"): (
+        ProductSearchRequest,
+        lambda body, tasks, state: _search_products(body, state.product_search)
+    ),
+    ("POST", "/agent/generate-payment"): (
+        PaymentRequest,
+        lambda body, tasks, state: _generate_payment(body, state.payment_processor)
+    ),
+    ("POST", "/agent/create-order"): (
+        OrderRequest,
+        lambda body, tasks, state: _create_order(body, tasks, state.agent)
+    ),
+}
+
+async def _dispatch_batch_item(item: BatchItem, background_tasks: BackgroundTasks, state) -> Dict[str, Any]:
+    route = _BATCH_ROUTES.get((item.method.upper(), item.path))
+    if route is None:
+        return {"status": 404, "data": {"detail": f"Unsupported batch route: {item.method} {item.path}"}}
+    model, operation = route
+    try:
+        body = model(**item.body)
+    except ValidationError as e:
+        return {"status": 422, "data": {"detail": e.errors()}}
+    try:
+        return {"status": 200, "data": await operation(body, background_tasks, state)}
     except Exception as e:
-        logger.error(f"Error creating order: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error("Error in batch item {} {}: {}", item.method, item.path, e)
+        return {"status": 500, "data": {"detail": str(e)}}
+
+@app.post("/batch")
+async def batch(
+    request: BatchRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks
+):
+    """Run several agent operations concurrently; the token is checked once by AuthMiddleware"""
+    semaphore = asyncio.Semaphore(_BATCH_CONCURRENCY)
+    
+    async def run(item: BatchItem) -> Dict[str, Any]:
+        async with semaphore:
+            return await _dispatch_batch_item(item, background_tasks, http_request.app.state)
+    
+    results = await asyncio.gather(*[run(item) for item in request.items])
+    return {
+        "success": all(result["status"] == 200 for result in results),
+        "results": results
+    }
 
 # Temu integration endpoints
 @app.get("/temu/products")
 async def get_temu_products(
+    http_request: Request,
     category: Optional[str] = None,
     limit: int = 20,
-    token: str = Depends(security)
+    temu_client: TemuClient = Depends(get_temu_client)
 ):
     """Get products from Temu API"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Get products from Temu
-        products = await temu_client.get_products(
-            category=category,
-            limit=limit
-        )
-        
-        return {
-            "success": True,
-            "products": products
-        }
-    except Exception as e:
-        logger.error(f"Error getting Temu products: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Get products from Temu
+    products = await _call_upstream(
+        http_request,
+        "temu",
+        lambda: temu_client.get_products(category=category, limit=limit)
+    )
+    
+    return {
+        "success": True,
+        "products": products
+    }
 
 @app.get("/temu/categories")
-async def get_temu_categories(token: str = Depends(security)):
+async def get_temu_categories(
+    http_request: Request,
+    temu_client: TemuClient = Depends(get_temu_client)
+):
     """Get available categories from Temu"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Get categories
-        categories = await temu_client.get_categories()
-        
-        return {
-            "success": True,
-            "categories": categories
-        }
-    except Exception as e:
-        logger.error(f"Error getting Temu categories: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Get categories
+    categories = await _categories_cache.get(
+        "categories",
+        lambda: _call_upstream(http_request, "temu", temu_client.get_categories)
+    )
+    
+    return {
+        "success": True,
+        "categories": categories
+    }
 
 # Correos de Costa Rica integration endpoints
 @app.post("/correos/create-shipment")
 async def create_shipment(
     order_id: str,
     recipient_info: Dict[str, str],
-    token: str = Depends(security)
+    http_request: Request,
+    correos_client: CorreosClient = Depends(get_correos_client)
 ):
     """Create shipment with Correos de Costa Rica"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Create shipment
-        shipment = await correos_client.create_shipment(
-            order_id=order_id,
-            recipient_info=recipient_info
-        )
-        
-        return {
-            "success": True,
-            "shipment": shipment
-        }
-    except Exception as e:
-        logger.error(f"Error creating shipment: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Create shipment
+    shipment = await _call_upstream(
+        http_request,
+        "correos",
+        lambda: correos_client.create_shipment(order_id=order_id, recipient_info=recipient_info)
+    )
+    
+    return {
+        "success": True,
+        "shipment": shipment
+    }
 
 @app.get("/correos/track-shipment/{tracking_number}")
 async def track_shipment(
     tracking_number: str,
-    token: str = Depends(security)
+    http_request: Request,
+    response: Response,
+    correos_client: CorreosClient = Depends(get_correos_client)
 ):
-    """Track shipment with Correos de Costa Rica"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Track shipment
-        tracking_info = await correos_client.track_shipment(tracking_number)
-        
-        return {
-            "success": True,
-            "tracking_info": tracking_info
-        }
-    except Exception as e:
-        logger.error(f"Error tracking shipment: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    """Track shipment with Correos de Costa Rica (supports If-None-Match polling)"""
+    # Track shipment
+    tracking_info = await _tracking_cache.get(
+        tracking_number,
+        lambda: _call_upstream(
+            http_request, "correos", lambda: correos_client.track_shipment(tracking_number)
+        )
+    )
+    
+    # Strong ETag over the tracking payload; unchanged polls get an empty 304
+    if HAS_ORJSON:
+        payload = orjson.dumps(tracking_info, option=orjson.OPT_SORT_KEYS, default=str)
+    else:
+        payload = json.dumps(tracking_info, sort_keys=True, default=str).encode("utf-8")
+    etag = f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+    cache_headers = {"ETag": etag, "Cache-Control": "private, max-age=30"}
+    if http_request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=cache_headers)
+    
+    response.headers.update(cache_headers)
+    return {
+        "success": True,
+        "tracking_info": tracking_info
+    }
 
 # SINPE integration endpoints
 @app.post("/sinpe/verify-payment")
 async def verify_payment(
     transaction_id: str,
-    token: str = Depends(security)
+    http_request: Request,
+    sinpe_client: SinpeClient = Depends(get_sinpe_client)
 ):
     """Verify SINPE payment"""
-    try:
-        # Verify token
-        user_data = verify_token(token.credentials)
-        
-        # Verify payment
-        payment_status = await sinpe_client.verify_payment(transaction_id)
-        
-        return {
-            "success": True,
-            "payment_status": payment_status
-        }
-    except Exception as e:
-        logger.error(f"Error verifying payment: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Verify payment
+    payment_status = await _call_upstream(
+        http_request, "sinpe", lambda: sinpe_client.verify_payment(transaction_id)
+    )
+    
+    return {
+        "success": True,
+        "payment_status": payment_status
+    }
 
 # Admin endpoints
 @app.get("/admin/conversations/{user_id}")
 async def get_user_conversations(
     user_id: str,
-    limit: int = 50,
-    token: str = Depends(security)
+    limit: int = Query(50, ge=1, le=_CONVERSATION_PAGE_MAX),
+    cursor: Optional[str] = None,
+    conversation_manager: ConversationManager = Depends(get_conversation_manager)
 ):
-    """Get user conversation history"""
-    try:
-        # Verify token (admin only)
-        user_data = verify_token(token.credentials)
-        
-        # Get conversations
-        conversations = await conversation_manager.get_user_conversations(
+    """
+    Get user conversation history, newest first, one page at a time.
+    
+    Pass the returned `next_cursor` as `cursor` to get the next-older page;
+    the cursor is pushed down to storage (created_at < cursor ORDER BY
+    created_at DESC LIMIT limit), so only one page is ever loaded.
+    """
+    # Get conversations
+    conversations, next_cursor = await fetch_page(
+        lambda limit, before: conversation_manager.get_user_conversations(
             user_id=user_id,
-            limit=limit
-        )
-        
-        return {
-            "success": True,
-            "conversations": conversations
-        }
-    except Exception as e:
-        logger.error(f"Error getting conversations: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+            limit=limit,
+            before=before
+        ),
+        limit,
+        cursor
+    )
+    
+    return StreamingResponse(
+        stream_page(conversations, next_cursor, _dumps, _CONVERSATION_CHUNK),
+        media_type="application/json"
+    )
 
 @app.get("/admin/analytics")
-async def get_analytics(token: str = Depends(security)):
+async def get_analytics(
+    agent: ShaymeeAgent = Depends(get_agent)
+):
     """Get system analytics"""
-    try:
-        # Verify token (admin only)
-        user_data = verify_token(token.credentials)
-        
-        # Get analytics
-        analytics = await agent.get_analytics()
-        
-        return {
-            "success": True,
-            "analytics": analytics
-        }
-    except Exception as e:
-        logger.error(f"Error getting analytics: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+    # Get analytics
+    analytics = await agent.get_analytics()
+    
+    return {
+        "success": True,
+        "analytics": analytics
+    }
+
+# Build request model schemas and validators at import instead of on each endpoint's first call
+for _model in (
+    MessageRequest, ProductSearchRequest, PaymentRequest, OrderRequest, BatchRequest
+):
+    _model.model_json_schema()
+app.openapi()
 
+# Production: gunicorn main:app -k uvicorn.workers.UvicornWorker -w 4 --bind 0.0.0.0:8001 --keep-alive 75 --backlog 2048
 if __name__ == "__main__":
+    dev_mode = os.getenv("ENV") == "dev"
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8001,
-        reload=True,
+        reload=dev_mode,
+        # reload runs a single worker
+        workers=1 if dev_mode else int(os.getenv("WORKERS", "1")),
+        loop="uvloop" if HAS_UVLOOP else "asyncio",
+        http="httptools",
+        timeout_keep_alive=75,
+        # Shed load with fast 503s instead of queueing unbounded work in memory
+        limit_concurrency=int(os.getenv("LIMIT_CONCURRENCY", "1000")),
+        backlog=int(os.getenv("BACKLOG", "2048")),
         log_level="info"
     ) 
\ No newline at end of file
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the service modules as the app does (`core.*`), from the ai-agent directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
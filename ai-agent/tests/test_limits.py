@@ -0,0 +1,48 @@
+import asyncio
+
+from core.limits import acquire_within
+
+
+def test_times_out_without_leaking_permits():
+    async def scenario():
+        semaphore = asyncio.Semaphore(2)
+        results = []
+
+        async def call():
+            if not await acquire_within(semaphore, 0.01):
+                results.append("busy")
+                return
+            try:
+                await asyncio.sleep(0.03)
+                results.append("ok")
+            finally:
+                semaphore.release()
+
+        await asyncio.gather(*[call() for _ in range(50)])
+        return semaphore, results
+
+    semaphore, results = asyncio.run(scenario())
+    assert results.count("ok") == 2
+    assert results.count("busy") == 48
+    # Every permit is back
+    assert semaphore._value == 2
+
+
+def test_cancelled_waiter_gives_permit_back():
+    async def scenario():
+        semaphore = asyncio.Semaphore(1)
+        await semaphore.acquire()
+        waiter = asyncio.ensure_future(acquire_within(semaphore, 5))
+        await asyncio.sleep(0)
+        semaphore.release()
+        # Cancel the caller right as the permit is handed over
+        waiter.cancel()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0)
+        return semaphore
+
+    semaphore = asyncio.run(scenario())
+    assert semaphore._value == 1
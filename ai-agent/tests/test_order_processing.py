@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from core.order_processing import process_paid_order
+
+
+class FakeTemu:
+    def __init__(self):
+        self.orders = []
+
+    async def create_order(self, products, shipping_address):
+        self.orders.append(products)
+        return {"temu_order_id": f"T{len(self.orders)}"}
+
+
+class FakeAgent:
+    """Order storage in a dict, with an optionally failing notification"""
+
+    def __init__(self, status="pending_payment", notify_error=None):
+        self.order = {
+            "order_id": "o1",
+            "user_id": "u1",
+            "products": [{"sku": "A", "quantity": 1, "price": 10}],
+            "shipping_address": {"line1": "x", "city": "San José", "province": "SJ"},
+            "status": status,
+        }
+        self.temu_client = FakeTemu()
+        self.notify_error = notify_error
+        self.notified = 0
+
+    async def _get_order(self, order_id):
+        return dict(self.order)
+
+    async def _update_order_status(self, order_id, status):
+        self.order["status"] = status
+
+    async def _update_order_temu_reference(self, order_id, temu_order_id):
+        self.order["temu_order_id"] = temu_order_id
+
+    async def _notify_user_order_update(self, user_id, order_id, status):
+        if self.notify_error is not None:
+            raise self.notify_error
+        self.notified += 1
+
+
+def test_purchases_and_notifies():
+    agent = FakeAgent()
+    asyncio.run(process_paid_order(agent, "o1"))
+    assert agent.order["status"] == "purchased"
+    assert len(agent.temu_client.orders) == 1
+    assert agent.notified == 1
+
+
+def test_notify_failure_after_purchase_never_buys_twice():
+    agent = FakeAgent(notify_error=RuntimeError("whatsapp down"))
+    with pytest.raises(RuntimeError):
+        asyncio.run(process_paid_order(agent, "o1"))
+    # The failure is raised for the queue to retry, without downgrading the order
+    assert agent.order["status"] == "purchased"
+
+    # The retry only re-sends the notification
+    agent.notify_error = None
+    asyncio.run(process_paid_order(agent, "o1"))
+    assert len(agent.temu_client.orders) == 1
+    assert agent.notified == 1
+
+
+def test_order_left_mid_purchase_goes_to_review():
+    agent = FakeAgent(status="processing")
+    asyncio.run(process_paid_order(agent, "o1"))
+    assert agent.order["status"] == "needs_review"
+    assert agent.temu_client.orders == []
+
+
+def test_failure_before_purchase_marks_error_and_retry_buys_once():
+    agent = FakeAgent()
+    calls = {"n": 0}
+    get_order = agent._get_order
+
+    async def flaky_get_order(order_id):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise ConnectionError("db down")
+        return await get_order(order_id)
+
+    agent._get_order = flaky_get_order
+    with pytest.raises(ConnectionError):
+        asyncio.run(process_paid_order(agent, "o1"))
+    assert agent.order["status"] == "error"
+
+    asyncio.run(process_paid_order(agent, "o1"))
+    assert agent.order["status"] == "purchased"
+    assert len(agent.temu_client.orders) == 1
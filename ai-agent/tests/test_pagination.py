@@ -0,0 +1,64 @@
+import asyncio
+import json
+
+from core.pagination import fetch_page, stream_page
+
+
+class FakeStore:
+    """In-memory storage honouring the contract: created_at < before, newest first"""
+
+    def __init__(self, rows, honour_before=True):
+        self.rows = rows
+        self.honour_before = honour_before
+        self.calls = []
+
+    async def query(self, limit, before=None):
+        self.calls.append({"limit": limit, "before": before})
+        rows = [
+            r for r in self.rows
+            if not self.honour_before or before is None or r["created_at"] < before
+        ]
+        rows.sort(key=lambda r: r["created_at"], reverse=True)
+        return rows[:limit]
+
+
+def _rows(n):
+    return [{"message": f"m{i}", "created_at": f"2024-01-01T00:00:{i:02d}"} for i in range(n)]
+
+
+def test_cursor_walks_pages_newest_first():
+    store = FakeStore(_rows(5))
+
+    first, cursor = asyncio.run(fetch_page(store.query, 2))
+    assert [r["message"] for r in first] == ["m4", "m3"]
+    assert cursor == "2024-01-01T00:00:03"
+
+    second, cursor = asyncio.run(fetch_page(store.query, 2, cursor))
+    assert [r["message"] for r in second] == ["m2", "m1"]
+    # The cursor reaches storage instead of being applied to an in-memory page
+    assert store.calls[-1] == {"limit": 2, "before": "2024-01-01T00:00:03"}
+
+    last, cursor = asyncio.run(fetch_page(store.query, 2, cursor))
+    assert [r["message"] for r in last] == ["m0"]
+    assert cursor is None
+
+
+def test_store_ignoring_cursor_ends_the_listing():
+    store = FakeStore(_rows(5), honour_before=False)
+
+    _, cursor = asyncio.run(fetch_page(store.query, 2))
+    rows, cursor = asyncio.run(fetch_page(store.query, 2, cursor))
+    assert rows == []
+    assert cursor is None
+
+
+def test_stream_page_is_valid_json_across_chunks():
+    async def collect():
+        rows = _rows(5)
+        dumps = lambda v: json.dumps(v).encode("utf-8")
+        return b"".join([part async for part in stream_page(rows, "c", dumps, chunk_size=2)])
+
+    body = json.loads(asyncio.run(collect()))
+    assert body["success"] is True
+    assert body["next_cursor"] == "c"
+    assert [r["message"] for r in body["conversations"]] == [f"m{i}" for i in range(5)]
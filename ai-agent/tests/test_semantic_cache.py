@@ -0,0 +1,58 @@
+import asyncio
+
+from core import semantic_cache
+from core.semantic_cache import SemanticCache
+
+
+class FailingBatcher:
+    """Embedder whose every batch fails, like a model that cannot load"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def embed(self, text):
+        self.calls += 1
+        raise RuntimeError("model unavailable")
+
+
+def test_embedding_failures_fail_open(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "HAS_EMBEDDINGS", True)
+    batcher = FailingBatcher()
+    cache = SemanticCache(batcher=batcher)
+
+    async def scenario():
+        await cache.set("u1", "hola, qué productos tienen?", "respuesta")
+        return await cache.get("u1", "hola, que productos hay?")
+
+    assert asyncio.run(scenario()) is None
+    assert batcher.calls >= 1
+
+
+def test_exact_repeat_hits_without_embeddings(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "HAS_EMBEDDINGS", False)
+    cache = SemanticCache(batcher=FailingBatcher())
+
+    async def scenario():
+        await cache.set("u1", "Hola,  qué productos tienen?", "respuesta")
+        own = await cache.get("u1", "hola, qué productos tienen?")
+        other = await cache.get("u2", "hola, qué productos tienen?")
+        return own, other
+
+    assert asyncio.run(scenario()) == ("respuesta", None)
+
+
+def test_failed_batch_still_caches_exact_repeats(monkeypatch):
+    monkeypatch.setattr(semantic_cache, "HAS_EMBEDDINGS", True)
+    batcher = FailingBatcher()
+    cache = SemanticCache(batcher=batcher)
+
+    async def scenario():
+        await cache.set("u1", "hola, qué productos tienen?", "respuesta")
+        # Every prompt in the failed batch is a miss, not an error
+        misses = await asyncio.gather(*[cache.get("u1", f"hola {w}") for w in ("a", "b", "c")])
+        return misses, await cache.get("u1", "hola,  qué productos tienen?")
+
+    misses, hit = asyncio.run(scenario())
+    assert misses == [None, None, None]
+    assert hit == "respuesta"
+    assert batcher.calls == 4
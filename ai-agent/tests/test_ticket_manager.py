@@ -0,0 +1,111 @@
+import asyncio
+import csv
+import json
+import os
+import threading
+
+from core.ticket_manager import TicketManager
+
+
+def test_ids_continue_after_reopen(tmp_path):
+    manager = TicketManager(data_dir=str(tmp_path))
+    first = manager.create_ticket(user_id="u1", subject="a")
+    second = manager.create_ticket(user_id="u1", subject="b")
+    manager.close()
+    assert (first["seq"], second["seq"]) == (1, 2)
+    assert first["ticket_id"] == f"TKT-{first['date']}-0001"
+
+    # close() mirrors the memory-mapped counter to JSON
+    with open(os.path.join(str(tmp_path), "ticket_counter.json"), encoding="utf-8") as f:
+        assert json.load(f) == {"date": second["date"], "seq": 2}
+
+    reopened = TicketManager(data_dir=str(tmp_path))
+    third = reopened.create_ticket(user_id="u2", subject="c")
+    assert third["seq"] == 3
+    assert reopened.get_counter()["last_ticket_id"] == third["ticket_id"]
+    reopened.close()
+
+
+def test_managers_on_one_directory_share_the_counter(tmp_path):
+    a = TicketManager(data_dir=str(tmp_path))
+    b = TicketManager(data_dir=str(tmp_path))
+    ids = [m.create_ticket(subject=str(i))["ticket_id"] for i, m in enumerate([a, b, a, b])]
+    assert len(set(ids)) == 4
+    assert [int(i.rsplit("-", 1)[1]) for i in ids] == [1, 2, 3, 4]
+    a.close()
+    b.close()
+
+
+def test_index_lookups_after_append(tmp_path):
+    writer = TicketManager(data_dir=str(tmp_path))
+    reader = TicketManager(data_dir=str(tmp_path))
+    first = writer.create_ticket(user_id="u1", subject='quoted "subject", with comma')
+    assert reader.get_ticket(first["ticket_id"]) == first
+
+    # Appended after the reader loaded the index: picked up on the next lookup
+    second = writer.create_ticket(user_id="u1", subject="later", metadata={"order": "ORD-1"})
+    assert reader.get_ticket(second["ticket_id"]) == second
+    assert reader.get_ticket("TKT-19700101-0001") is None
+    assert [t["seq"] for t in reader.list_tickets(first["date"])] == [2, 1]
+    assert reader.list_tickets(first["date"], limit=1) == [second]
+    writer.close()
+    reader.close()
+
+
+def test_index_is_rebuilt_from_the_log(tmp_path):
+    manager = TicketManager(data_dir=str(tmp_path))
+    record = manager.create_ticket(user_id="u1", subject="a")
+    manager.close()
+    os.remove(os.path.join(str(tmp_path), "tickets.idx"))
+
+    reopened = TicketManager(data_dir=str(tmp_path))
+    assert reopened.get_ticket(record["ticket_id"]) == record
+    reopened.close()
+
+
+def test_concurrent_batched_writes(tmp_path):
+    manager = TicketManager(data_dir=str(tmp_path))
+
+    async def scenario():
+        records = await asyncio.gather(*[
+            manager.acreate_ticket(user_id=f"u{i}", subject=f"s{i}", metadata={"i": i})
+            for i in range(50)
+        ])
+        await manager.aclose()
+        return records
+
+    records = asyncio.run(scenario())
+    assert sorted(r["seq"] for r in records) == list(range(1, 51))
+
+    # Every ticket written once to each log, and reachable through the index
+    with open(os.path.join(str(tmp_path), "tickets.jsonl"), "rb") as f:
+        lines = [json.loads(line) for line in f]
+    assert sorted(line["ticket_id"] for line in lines) == sorted(r["ticket_id"] for r in records)
+    with open(os.path.join(str(tmp_path), "tickets.csv"), newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 50
+    assert {json.loads(row["metadata_json"])["i"] for row in rows} == set(range(50))
+
+    reopened = TicketManager(data_dir=str(tmp_path))
+    for record in records:
+        assert reopened.get_ticket(record["ticket_id"]) == record
+    reopened.close()
+
+
+def test_threads_never_share_a_ticket_id(tmp_path):
+    manager = TicketManager(data_dir=str(tmp_path))
+    ids = []
+
+    def create():
+        for _ in range(20):
+            ids.append(manager.create_ticket(subject="t")["ticket_id"])
+
+    threads = [threading.Thread(target=create) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(ids)) == 80
+    assert len(manager.list_tickets(limit=1000)) == 80
+    manager.close()
@@ -0,0 +1,86 @@
+"""
+Celery worker for the work the API hands off after responding.
+
+Orders and conversation storage go to separate queues so order processing
+can get its own workers and is never stuck behind a burst of chat traffic:
+
+    celery -A worker worker -Q orders -c 4
+    celery -A worker worker -Q conversations -c 2
+"""
+import asyncio
+import os
+from typing import Any, Dict, Optional
+from celery import Celery
+from dotenv import load_dotenv
+from loguru import logger
+
+# Load environment variables
+load_dotenv()
+
+celery_app = Celery("shaymee", broker=os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+celery_app.conf.update(
+    task_serializer="json",
+    accept_content=["json"],
+    task_acks_late=True,
+    worker_prefetch_multiplier=1,
+    task_default_queue="conversations",
+    task_routes={
+        "process_order": {"queue": "orders"},
+        "store_conversation": {"queue": "conversations"},
+    },
+)
+
+# Retry failed jobs with exponential backoff (capped at 5 minutes)
+_RETRY_OPTIONS = dict(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=300,
+    retry_jitter=True,
+    max_retries=5,
+)
+
+# One event loop per worker process, so services and their sessions are reused across jobs
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_services: Dict[str, Any] = {}
+
+
+def _run(coro):
+    global _loop
+    if _loop is None:
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
+
+
+def _conversation_manager():
+    if "conversation_manager" not in _services:
+        from core.conversation_manager import ConversationManager
+        _services["conversation_manager"] = ConversationManager()
+    return _services["conversation_manager"]
+
+
+def _agent():
+    if "agent" not in _services:
+        from core.agent import ShaymeeAgent
+        agent = ShaymeeAgent.instance()
+        _run(agent.startup())
+        _services["agent"] = agent
+    return _services["agent"]
+
+
+@celery_app.task(name="store_conversation", **_RETRY_OPTIONS)
+def store_conversation(user_id: str, message: str, response: Any, session_id: Optional[str] = None):
+    """Persist one conversation turn"""
+    _run(_conversation_manager().store_conversation(
+        user_id=user_id,
+        message=message,
+        response=response,
+        session_id=session_id
+    ))
+
+
+@celery_app.task(name="process_order", **_RETRY_OPTIONS)
+def process_order(order_id: str):
+    """Run the post-checkout order pipeline (Temu purchase, shipping, notifications); safe to retry"""
+    logger.info(f"Processing order {order_id} from queue")
+    _run(_agent().process_order_background(order_id=order_id))
@@ -8,18 +8,45 @@ Real products automatically transformed into Shaymee branded products
 
 import aiohttp
 import asyncio
+import hashlib
 import json
 import os
 import random
 import re
 import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
 from datetime import datetime
+from operator import itemgetter
+from types import MappingProxyType
 from typing import List, Dict, Any, Optional
+from urllib.parse import urljoin
 import logging
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, Error as PlaywrightError
 from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 
+# uvloop gives the event loop cheaper task switches and I/O callbacks (not on Windows)
+try:
+    import uvloop  # type: ignore
+    HAS_UVLOOP = True
+except Exception:
+    HAS_UVLOOP = False
+
+# aiofiles streams image downloads to disk without blocking the event loop
+try:
+    import aiofiles  # type: ignore
+    HAS_AIOFILES = True
+except Exception:
+    HAS_AIOFILES = False
+
+# orjson writes the catalog considerably faster than the stdlib json encoder
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
 # Simple ProductRebrander class since we're using mock data
 class ProductRebrander:
     def __init__(self, api_key=None):
@@ -32,11 +59,11 @@ class ProductRebrander:
             **product_data,
             'brand': 'Shaymee',
             'description': f"{product_data.get('description', '')} - ¡Exclusivo en Shaymee!",
-            'features': product_data.get('features', []) + [
+            'features': list(dict.fromkeys(product_data.get('features', []) + [
                 '✓ Calidad premium',
                 '✓ Envío rápido y seguro',
                 '✓ Garantía de satisfacción'
-            ]
+            ]))
         }
 
 # Configure logging
@@ -50,28 +77,197 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Products rebranded per run, and parallel image downloads
+MAX_PRODUCTS = 10
+IMAGE_DOWNLOAD_WORKERS = 8
+
+# AI rebranding calls in flight, and the provider's requests-per-minute budget
+REBRAND_CONCURRENCY = int(os.getenv('REBRAND_CONCURRENCY', '5'))
+REBRAND_RPM = int(os.getenv('REBRAND_RPM', '60'))
+
+# Browser contexts open at the same time when scraping falls back to Playwright
+MAX_BROWSER_CONTEXTS = int(os.getenv('MAX_BROWSER_CONTEXTS', '3'))
+
+# Listing price = CRC price converted to USD (approximate rate) plus a 40% markup,
+# folded into one factor so each product costs a single multiplication
+CRC_PER_USD = 600
+MARKUP = 1.4
+CRC_TO_LISTING_USD = MARKUP / CRC_PER_USD
+LISTING_MARGIN = f"{(MARKUP - 1) * 100:.0f}"
+
+# Pequeño Mundo search results page for a term
+SEARCH_URL = "https://tienda.pequenomundo.com/catalogsearch/result/?q={}"
+
+# Browser cookies/storage kept between runs (set PERSIST_BROWSER_STATE=0 to start clean, e.g. in CI)
+BROWSER_STATE_FILE = os.getenv('BROWSER_STATE_FILE', 'pm_state.json')
+PERSIST_BROWSER_STATE = os.getenv('PERSIST_BROWSER_STATE', '1') != '0'
+
+# Resource types the scraper does not need to render search results
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'stylesheet', 'media'})
+
+# Browser user agents picked at random per scraping session
+USER_AGENTS = (
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+)
+
+# Categories and their title keywords (the first category with a match wins)
+CATEGORY_KEYWORDS = MappingProxyType({
+    'juguetes': ('juguete', 'juego', 'peluche', 'muñec', 'lego', 'figura'),
+    'reloj': ('reloj', 'cronómetro', 'temporizador'),
+    'electronico': ('electrónic', 'cargador', 'cable', 'usb', 'bluetooth', 'inalámbrico'),
+    'casa': ('mueble', 'decoración', 'almohada', 'cortina', 'alfombra', 'lámpara'),
+    'cocina': ('cocina', 'olla', 'sartén', 'cuchillo', 'cuchara', 'tenedor', 'plato', 'vaso')
+})
+
+# One precompiled alternation per category, so each title is scanned once per category
+CATEGORY_PATTERNS = MappingProxyType({
+    cat: re.compile('|'.join(map(re.escape, keywords)))
+    for cat, keywords in CATEGORY_KEYWORDS.items()
+})
+
+# Keywords as whole tokens; a title containing one of these words needs no regex scan
+CATEGORY_TOKENS = MappingProxyType({
+    cat: frozenset(keywords) for cat, keywords in CATEGORY_KEYWORDS.items()
+})
+TOKEN_RE = re.compile(r"\w+")
+
+def classify_category(title_lower):
+    """Return the first category with a keyword in the (lowercased) title, or 'general'"""
+    tokens = set(TOKEN_RE.findall(title_lower))
+    for cat, pattern in CATEGORY_PATTERNS.items():
+        # Exact words hit the set; stems and plurals ("muñec", "relojes") fall back to the regex
+        if not tokens.isdisjoint(CATEGORY_TOKENS[cat]) or pattern.search(title_lower):
+            return cat
+    return 'general'
+
+# First number in a price string such as "₡12,500" or "$20.83" (commas are thousands separators)
+PRICE_RE = re.compile(r"(\d[\d.,]*)")
+
+def parse_money(text):
+    """Return the amount in a price string as a float, or None if it has none"""
+    match = PRICE_RE.search(text or "")
+    if not match:
+        return None
+    try:
+        return float(match.group(1).replace(',', ''))
+    except ValueError:
+        return None
+
+@dataclass
+class ProductColumns:
+    """Rebranded products split into per-field columns, parsed once and shared by the report steps"""
+    prices: List[Optional[float]]           # USD
+    original_prices: List[Optional[float]]  # CRC, when the original price is in colones
+    margins: List[Optional[float]]
+    categories: List[str]
+    
+    @classmethod
+    def from_products(cls, products):
+        columns = cls([], [], [], [])
+        for product in products:
+            price, original_price, margin, category = _column_fields(_with_listing_defaults(product))
+            columns.prices.append(parse_money(price))
+            columns.original_prices.append(
+                parse_money(original_price) if original_price.startswith('₡') else None
+            )
+            columns.margins.append(parse_money(margin))
+            columns.categories.append(category)
+        return columns
+
+# Fields a listing may be missing, filled in once so later reads can index directly
+LISTING_DEFAULTS = MappingProxyType({
+    'price': '$0',
+    'original_price': '',
+    'margin': '0',
+    'category': 'general',
+})
+_column_fields = itemgetter(*LISTING_DEFAULTS)
+
+def _with_listing_defaults(product):
+    """Fill in any missing LISTING_DEFAULTS fields in place"""
+    for key, default in LISTING_DEFAULTS.items():
+        product.setdefault(key, default)
+    return product
+
+# Divider between a message's header and body in the WhatsApp export
+MESSAGE_DIVIDER = "-" * 40
+
+# Spanish-style number formatting: "." groups thousands, "," marks decimals
+_SPANISH_SEPARATORS = str.maketrans(',.', '.,')
+
+def format_usd(amount):
+    """Format dollars the Spanish way, e.g. $1.234,56"""
+    return "$" + f"{amount:,.2f}".translate(_SPANISH_SEPARATORS)
+
+def format_crc(amount):
+    """Format colones the Spanish way, e.g. ₡12.500"""
+    return "₡" + f"{amount:,.0f}".translate(_SPANISH_SEPARATORS)
+
+def print_step(title):
+    """Print a step banner (title plus divider) in a single write"""
+    print(f"\n{title}\n{'-' * 40}")
+
+class RetryableStatus(Exception):
+    """HTTP response worth retrying (429 or 5xx), with the server's Retry-After if it sent one"""
+    
+    def __init__(self, status, retry_after=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+def raise_for_retryable_status(response):
+    """Raise RetryableStatus for a rate-limited or failing upstream response"""
+    if response.status == 429 or response.status >= 500:
+        retry_after = response.headers.get('Retry-After', '')
+        raise RetryableStatus(response.status, float(retry_after) if retry_after.isdigit() else None)
+
+# Transient failures retried by with_retry
+RETRYABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, PlaywrightError, RetryableStatus)
+
+async def with_retry(call, tries=4, max_delay=30):
+    """Await call() again on transient errors, backing off exponentially with jitter"""
+    for attempt in range(tries):
+        try:
+            return await call()
+        except RETRYABLE_ERRORS as e:
+            if attempt == tries - 1:
+                raise
+            delay = min(getattr(e, 'retry_after', None) or 2 ** attempt + random.random(), max_delay)
+            logger.warning("Retrying in %.1fs after %s", delay, e)
+            await asyncio.sleep(delay)
+
 class AutomaticPipeline:
     def __init__(self):
-        self.rebrander = None  # Will initialize if API key available
-        self.user_agents = [
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-        ]
+        api_key = os.getenv('OPENAI_API_KEY')
+        self.rebrander = ProductRebrander(api_key) if api_key else None
+        self.image_files = {}  # image URL -> saved filename
         
     async def run_complete_pipeline(self):
         """Run the complete automatic pipeline"""
         
-        print("🚀 SHAYMEE COMPLETE AUTOMATIC PIPELINE")
-        print("="*60)
-        print("📦 Pequeño Mundo → AI Rebranding → Shaymee Marketplace")
-        print("="*60)
+        print("🚀 SHAYMEE COMPLETE AUTOMATIC PIPELINE\n"
+              f"{'=' * 60}\n"
+              "📦 Pequeño Mundo → AI Rebranding → Shaymee Marketplace\n"
+              f"{'=' * 60}")
+        
+        # Steps 1-2: Scrape real products and rebrand them as they arrive; scraping,
+        # rebranding and image downloads run concurrently, connected by bounded queues
+        print_step("🥷 STEP 1-2: SCRAPING REAL PRODUCTS + SHAYMEE REBRANDING")
         
-        # Step 1: Scrape real products
-        print("\n🥷 STEP 1: SCRAPING REAL PRODUCTS")
-        print("-" * 40)
+        scraped_queue = asyncio.Queue(maxsize=64)
         
-        scraped_products = await self._scrape_products()
+        async def scrape():
+            try:
+                return await self._scrape_products(scraped_queue)
+            finally:
+                await scraped_queue.put(None)  # End of products
+        
+        scraped_products, rebranded_products = await asyncio.gather(
+            scrape(),
+            self._rebrand_and_download(scraped_queue)  # Using mock rebranding
+        )
         
         if not scraped_products:
             print("❌ No products scraped - pipeline cannot continue")
@@ -79,37 +275,71 @@ class AutomaticPipeline:
         
         print(f"✅ Successfully scraped {len(scraped_products)} real products!")
         
-        # Step 2: AI Rebranding (if API key available)
-        print("\n🎨 STEP 2: AI REBRANDING WITH SHAYMEE BRANDING")
-        print("-" * 40)
-        
-        rebranded_products = await self._mock_rebrand_products(scraped_products)  # Using mock rebranding
-        
         # Step 3: Generate marketplace data
-        print("\n🏪 STEP 3: SHAYMEE MARKETPLACE READY")
-        print("-" * 40)
+        print_step("🏪 STEP 3: SHAYMEE MARKETPLACE READY")
+        
+        # Parse prices, margins and categories once for both report steps
+        columns = ProductColumns.from_products(rebranded_products)
         
-        await self._generate_marketplace_data(rebranded_products)
+        await self._generate_marketplace_data(rebranded_products, columns)
         
         # Step 4: Business analytics
-        print("\n📊 STEP 4: BUSINESS ANALYTICS")
-        print("-" * 40)
+        print_step("📊 STEP 4: BUSINESS ANALYTICS")
         
-        self._generate_business_analytics(rebranded_products)
+        self._generate_business_analytics(rebranded_products, columns)
         
-        print(f"\n🎉 PIPELINE COMPLETE!")
-        print(f"📱 Ready for WhatsApp integration")
-        print(f"🛒 Ready for customer orders")
+        print("\n🎉 PIPELINE COMPLETE!\n"
+              "📱 Ready for WhatsApp integration\n"
+              "🛒 Ready for customer orders")
         
-    async def _scrape_products(self):
-        """Scrape products from Pequeño Mundo using Playwright with stealth settings"""
+    async def _scrape_products(self, product_queue=None):
+        """
+        Scrape products from Pequeño Mundo over HTTP, falling back to stealth Playwright.
+        Each term's products are also put on `product_queue` as soon as they are found.
+        """
         search_terms = ["juguetes", "reloj", "electronico", "casa", "cocina"]
         all_products = []
         
+        async def emit(products):
+            all_products.extend(products)
+            if product_queue is not None:
+                for product in products:
+                    await product_queue.put(product)
+        
         # Add a random delay to appear more human-like
         await asyncio.sleep(random.uniform(1, 3))     
         
-        print("\n🔍 Starting product scraping with Playwright...")
+        print("\n🔍 Starting product scraping...")
+        
+        # Fast path: search pages rendered server-side need just one HTTP request per term
+        connector = aiohttp.TCPConnector(limit=10, ttl_dns_cache=300)
+        headers = {
+            'User-Agent': random.choice(USER_AGENTS),
+            'Accept-Language': 'es-CR,es;q=0.9'
+        }
+        async def scrape_term_http(session, term):
+            products = await self._scrape_term_http(session, term)
+            if products:
+                logger.info("Found %d products for '%s' (HTTP)", len(products), term)
+                await emit(products)
+            return products
+        
+        async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+            results = await asyncio.gather(
+                *(scrape_term_http(session, term) for term in search_terms),
+                return_exceptions=True
+            )
+        
+        # Terms with no products over plain HTTP (JS-rendered grid, bot wall) go to the browser
+        browser_terms = [
+            term for term, result in zip(search_terms, results)
+            if not (isinstance(result, list) and result)
+        ]
+        
+        if not browser_terms:
+            return all_products
+        
+        print(f"\n🔍 Falling back to Playwright for {len(browser_terms)} term(s)...")
         
         async with async_playwright() as p:
             # Launch browser with stealth settings
@@ -127,132 +357,172 @@ class AutomaticPipeline:
                 ]
             )
             
-            # Create a new browser context with a random user agent
-            user_agent = random.choice(self.user_agents)
-            context = await browser.new_context(
-                user_agent=user_agent,
-                viewport={'width': 1920, 'height': 1080},
-                locale='es-CR',
-                timezone_id='America/Costa_Rica'
-            )
-            
-            # Disable WebDriver detection
-            await context.add_init_script("""
-                Object.defineProperty(navigator, 'webdriver', {
-                    get: () => undefined
-                });
-            """)
+            # Reuse cookies and local storage from the previous run to skip the cold start
+            context_options = {}
+            if PERSIST_BROWSER_STATE and os.path.exists(BROWSER_STATE_FILE):
+                context_options['storage_state'] = BROWSER_STATE_FILE
+            state_saved = False
             
-            page = await context.new_page()
-            
-            try:
-                for term in search_terms:
-                    print(f"🔍 Scraping: '{term}'...")
+            async def scrape_term(term):
+                nonlocal state_saved
+                
+                # Each term gets its own isolated context with a random user agent
+                context = await browser.new_context(
+                    user_agent=random.choice(USER_AGENTS),
+                    viewport={'width': 1920, 'height': 1080},
+                    locale='es-CR',
+                    timezone_id='America/Costa_Rica',
+                    **context_options
+                )
+                
+                # Disable WebDriver detection
+                await context.add_init_script("""
+                    Object.defineProperty(navigator, 'webdriver', {
+                        get: () => undefined
+                    });
+                """)
+                
+                page = None
+                try:
+                    page = await context.new_page()
+                    # Only the product HTML is needed; skip images, fonts, CSS and media
+                    await page.route("**/*", self._block_heavy_resources)
+                    logger.info("Scraping '%s' in browser", term)
                     
                     # Navigate to search page
-                    search_url = f"https://tienda.pequenomundo.com/catalogsearch/result/?q={term}"
-                    await page.goto(search_url, timeout=60000)
+                    await with_retry(lambda: page.goto(SEARCH_URL.format(term), timeout=60000))
                     
                     # Wait for product grid to load
                     try:
                         await page.wait_for_selector('.products-grid', timeout=10000)
                     except:
-                        print(f"  ⚠️ Could not find products for: {term}")
-                        continue
+                        logger.warning("Could not find products for '%s'", term)
+                        return []
                     
-                    # Extract product data
-                    products = await page.evaluate('''() => {
-                        const items = [];
-                        document.querySelectorAll('.product-item').forEach(item => {
-                            const titleEl = item.querySelector('.product-item-name a');
-                            const priceEl = item.querySelector('.price');
-                            const imageEl = item.querySelector('.product-image-photo');
-                            const linkEl = item.querySelector('.product-item-link');
-                            
-                            if (titleEl && priceEl) {
-                                items.push({
-                                    title: titleEl.innerText.trim(),
-                                    price: priceEl.innerText.trim(),
-                                    imageUrl: imageEl ? imageEl.src : '',
-                                    productUrl: linkEl ? linkEl.href : ''
-                                });
-                            }
-                        });
-                        return items;
-                    }''')
+                    # Extract product data from the rendered HTML
+                    products = self._parse_products(await page.content(), page.url)
                     
                     if products:
-                        print(f"  ✅ Found {len(products)} products")
-                        all_products.extend(products)
+                        logger.info("Found %d products for '%s'", len(products), term)
+                        await emit(products)
                     else:
-                        print("  😞 No products found")
+                        logger.info("No products found for '%s'", term)
+                    
+                    # Save the first successful context's state for the next run
+                    if PERSIST_BROWSER_STATE and not state_saved:
+                        state_saved = True
+                        await context.storage_state(path=BROWSER_STATE_FILE)
+                    return products
+                    
+                finally:
+                    try:
+                        # Drop the route handler first so nothing keeps the closed context alive
+                        if page is not None:
+                            await page.unroute("**/*", self._block_heavy_resources)
+                    finally:
+                        await context.close()
+            
+            # Cap how many contexts (and their renderer memory) are alive at once
+            context_slots = asyncio.Semaphore(MAX_BROWSER_CONTEXTS)
+            
+            async def scrape_term_bounded(term):
+                async with context_slots:
+                    return await scrape_term(term)
+            
+            try:
+                # Scrape terms concurrently, one short-lived context per term in the shared browser
+                results = await asyncio.gather(
+                    *(scrape_term_bounded(term) for term in browser_terms),
+                    return_exceptions=True
+                )
+                for term, result in zip(browser_terms, results):
+                    if isinstance(result, Exception):
+                        logger.error("Error scraping '%s': %s", term, result)
                         
-            except Exception as e:
-                print(f"  ❌ Error during scraping: {str(e)}")
-                
             finally:
                 await browser.close()
                 
         return all_products
     
-    async def _rebrand_products(self, scraped_products):
-        """Rebrand products with AI or use mock rebranding"""
-        
-        try:
-            # Try to initialize rebrander with API key
-            self.rebrander = ProductRebrander()
-            print("🤖 Using AI rebranding with OpenAI")
-        except:
-            print("⚠️  OpenAI API key not available - using mock rebranding")
-            return self._mock_rebrand_products(scraped_products)
-        
-        rebranded_products = []
-        
-        for i, product in enumerate(scraped_products[:10], 1):  # Limit to 10 for demo
-            print(f"🎨 Rebranding {i}/{min(10, len(scraped_products))}: {product['title'][:30]}...")
-            
-            try:
-                rebranded = await self.rebrander.rebrand_product(
-                    title=product['title'],
-                    price=product['price'],
-                    image_url=product['imageUrl'],
-                    product_url=product['productUrl'],
-                    original_source="Pequeño Mundo (Costa Rica)"
-                )
-                
-                if rebranded:
-                    rebranded_products.append(rebranded)
-                    print(f"  ✅ Rebranded: {rebranded['title'][:40]}...")
-                else:
-                    print(f"  ❌ Failed to rebrand")
-                    
-            except Exception as e:
-                print(f"  💥 Error: {e}")
+    async def _scrape_term_http(self, session, term):
+        """Fetch one search page without a browser; returns [] when it needs JavaScript"""
+        async def fetch():
+            async with session.get(SEARCH_URL.format(term), timeout=aiohttp.ClientTimeout(total=20)) as response:
+                raise_for_retryable_status(response)
+                if response.status != 200:
+                    return []
+                html = await response.text()
+                return self._parse_products(html, str(response.url))
+        
+        return await with_retry(fetch)
+    
+    @staticmethod
+    def _parse_products(html, base_url):
+        """Extract title, price, image and link for each product in a search results page"""
+        soup = BeautifulSoup(html, 'lxml')
+        items = []
+        for item in soup.select('.product-item'):
+            title_el = item.select_one('.product-item-name a')
+            price_el = item.select_one('.price')
+            if not title_el or not price_el:
                 continue
-        
-        return rebranded_products
+            image_el = item.select_one('.product-image-photo')
+            link_el = item.select_one('.product-item-link')
+            items.append({
+                'title': title_el.get_text(strip=True),
+                'price': price_el.get_text(strip=True),
+                'imageUrl': urljoin(base_url, image_el['src']) if image_el and image_el.get('src') else '',
+                'productUrl': urljoin(base_url, link_el['href']) if link_el and link_el.get('href') else ''
+            })
+        return items
     
-    async def _download_image(self, url, product_id):
+    @staticmethod
+    async def _block_heavy_resources(route):
+        """Abort requests for resources the scraper never reads"""
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        else:
+            await route.continue_()
+    
+    async def _download_image(self, session, url):
         """Download and save product image"""
+        # Already saved during this run
+        if url in self.image_files:
+            return self.image_files[url]
         try:
             # Create images directory if it doesn't exist
             os.makedirs('product_images', exist_ok=True)
             
-            # Generate filename with product ID
-            filename = f"product_images/{product_id}.jpg"
+            # Name the file after the URL, so it survives title changes and re-runs
+            digest = hashlib.blake2b(url.encode('utf-8'), digest_size=8).hexdigest()
+            filename = f"product_images/{digest}.jpg"
             
             # Skip if already downloaded
             if os.path.exists(filename):
+                self.image_files[url] = filename
                 return filename
                 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status == 200:
-                        with open(filename, 'wb') as f:
+            async def fetch():
+                async with session.get(url, timeout=aiohttp.ClientTimeout(total=15)) as response:
+                    raise_for_retryable_status(response)
+                    if response.status != 200:
+                        return None
+                    # Write to a temporary name so an interrupted download is never taken as cached
+                    partial = f"{filename}.part"
+                    if HAS_AIOFILES:
+                        async with aiofiles.open(partial, 'wb') as f:
+                            async for chunk in response.content.iter_chunked(64 * 1024):
+                                await f.write(chunk)
+                    else:
+                        with open(partial, 'wb') as f:
                             f.write(await response.read())
-                        return filename
+                    os.replace(partial, filename)
+                    self.image_files[url] = filename
+                    return filename
+            
+            return await with_retry(fetch)
         except Exception as e:
-            print(f"  ⚠️ Error downloading image: {e}")
+            logger.warning("Error downloading image %s: %s", url, e)
         return None
 
     def _generate_product_id(self, title):
@@ -263,96 +533,155 @@ class AutomaticPipeline:
 
     async def _mock_rebrand_products(self, scraped_products):
         """Mock rebranding for demonstration"""
-        print("🎭 Using mock AI rebranding (for demo)")
-        
-        rebranded_products = []
-        
-        # Define categories and their keywords
-        categories = {
-            'juguetes': ['juguete', 'juego', 'peluche', 'muñec', 'lego', 'figura'],
-            'reloj': ['reloj', 'cronómetro', 'temporizador'],
-            'electronico': ['electrónic', 'cargador', 'cable', 'usb', 'bluetooth', 'inalámbrico'],
-            'casa': ['mueble', 'decoración', 'almohada', 'cortina', 'alfombra', 'lámpara'],
-            'cocina': ['cocina', 'olla', 'sartén', 'cuchillo', 'cuchara', 'tenedor', 'plato', 'vaso']
-        }
-        
-        for i, product in enumerate(scraped_products[:10], 1):
-            # Generate a unique product ID
-            product_id = f"{i:03d}_{self._generate_product_id(product.get('title', ''))}"
-            
-            # Determine category based on product title
-            title_lower = product.get('title', '').lower()
-            category = 'general'
-            for cat, keywords in categories.items():
-                if any(keyword in title_lower for keyword in keywords):
-                    category = cat
-                    break
+        scraped_queue = asyncio.Queue()
+        for product in scraped_products:
+            scraped_queue.put_nowait(product)
+        scraped_queue.put_nowait(None)  # End of products
+        return await self._rebrand_and_download(scraped_queue)
+    
+    async def _rebrand_and_download(self, scraped_queue):
+        """
+        Rebrand products taken from `scraped_queue` until a None sentinel, downloading
+        their images in parallel workers while later products are still being rebranded.
+        
+        Every product gets its mock Shaymee listing; when `self.rebrander` is set the
+        listing is also passed through it, with at most REBRAND_CONCURRENCY calls in
+        flight and call starts spaced to stay within REBRAND_RPM requests per minute.
+        """
+        if self.rebrander:
+            print("🤖 Using AI rebranding")
+        else:
+            print("🎭 Using mock AI rebranding (for demo)")
+        
+        rebranded_products = []  # In scraped order; None until that product is done
+        download_queue = asyncio.Queue(maxsize=64)
+        # The same image often shows up under several search terms; download each URL once
+        # and hand the filename to every product that uses it
+        image_users = {}  # image URL -> rebranded products waiting for it
+        semaphore = asyncio.Semaphore(REBRAND_CONCURRENCY)
+        pace_lock = asyncio.Lock()
+        next_start = 0.0
+        
+        async def rebrand_one(i, product):
+            nonlocal next_start
+            rebranded = self._mock_rebrand_product(i, product)
+            if self.rebrander:
+                async with semaphore:
+                    async with pace_lock:
+                        delay = next_start - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                        next_start = time.monotonic() + 60 / REBRAND_RPM
+                    try:
+                        rebranded = await self.rebrander.rebrand_product(rebranded)
+                    except Exception as e:
+                        # Keep the mock listing rather than dropping the product
+                        logger.error("Error rebranding %s: %s", rebranded['title'][:40], e)
+            rebranded_products[i - 1] = rebranded
+            logger.info("%d. Processed: %s", i, rebranded['title'][:40])
             
-            # Convert price from CRC to USD with markup
+            url = product.get('imageUrl')
+            if not url:
+                return
+            if url in self.image_files:
+                rebranded['image_filename'] = self.image_files[url]
+            elif url in image_users:
+                image_users[url].append(rebranded)
+            else:
+                image_users[url] = [rebranded]
+                await download_queue.put(url)
+        
+        async def rebrand():
             try:
-                price_text = product.get('price', '₡0').replace('₡', '').replace(',', '').strip()
-                price_crc = float(price_text)
-                price_usd = price_crc / 600  # Approximate conversion
-                shaymee_price = price_usd * 1.4  # 40% markup
-                price_str = f"${shaymee_price:.2f}"
-            except (ValueError, AttributeError):
-                price_str = f"${random.uniform(10, 100):.2f}"
-            
-            # Download and save the product image
-            image_filename = None
-            if product.get('imageUrl'):
-                image_filename = await self._download_image(product['imageUrl'], product_id)
-            
-            # Create rebranded product
-            rebranded = {
-                'id': product_id,
-                'title': product.get('title', 'Producto'),  # Original title without Shaymee prefix
-                'price': price_str,
-                'original_price': product.get('price', '₡0'),
-                'margin': "40",
-                'image_filename': image_filename or '',
-                'productUrl': product.get('productUrl', ''),
-                'description': f"{product.get('title', 'Producto')} - Calidad premium garantizada",
-                'category': category,
-                'source': 'Pequeño Mundo',
-                'brand': 'Shaymee',
-                'whatsapp_ready': True,
-                'features': [
-                    "✓ Calidad premium",
-                    "✓ Envío rápido y seguro",
-                    "✓ Garantía de satisfacción"
-                ]
-            }
-            
-            rebranded_products.append(rebranded)
-            print(f"  ✅ {i}. Processed: {rebranded['title'][:40]}...")
-            
-            # Add a small delay between requests
-            await asyncio.sleep(0.5)
-            
+                tasks = []
+                while (product := await scraped_queue.get()) is not None:
+                    if len(tasks) >= MAX_PRODUCTS:
+                        continue  # Keep draining so the scraper never blocks on a full queue
+                    rebranded_products.append(None)
+                    tasks.append(asyncio.ensure_future(rebrand_one(len(tasks) + 1, product)))
+                await asyncio.gather(*tasks)
+            finally:
+                for _ in range(IMAGE_DOWNLOAD_WORKERS):
+                    await download_queue.put(None)
+        
+        async def download(session):
+            while (url := await download_queue.get()) is not None:
+                filename = await self._download_image(session, url) or ''
+                for rebranded in image_users[url]:
+                    rebranded['image_filename'] = filename
+        
+        # One pooled keep-alive session for every image download
+        connector = aiohttp.TCPConnector(limit=20, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await asyncio.gather(
+                rebrand(),
+                *(download(session) for _ in range(IMAGE_DOWNLOAD_WORKERS))
+            )
+        
+        images = sum(1 for rebranded in rebranded_products if rebranded['image_filename'])
+        print(f"✅ Processed {len(rebranded_products)} products ({images} with images)")
         return rebranded_products
     
-    async def _generate_marketplace_data(self, rebranded_products):
+    def _mock_rebrand_product(self, i, product):
+        """Build the Shaymee listing for the i-th scraped product (image_filename is set once downloaded)"""
+        title = product.get('title', '')
+        original_price = product.get('price', '₡0')
+        
+        # Generate a unique product ID
+        product_id = f"{i:03d}_{self._generate_product_id(title)}"
+        
+        # Determine category based on product title
+        category = classify_category(title.lower())
+        
+        # Convert price from CRC to USD with markup
+        price_crc = parse_money(original_price)
+        if price_crc is not None:
+            price_str = f"${price_crc * CRC_TO_LISTING_USD:.2f}"
+        else:
+            price_str = f"${random.uniform(10, 100):.2f}"
+        
+        # Create rebranded product
+        title = title or 'Producto'
+        return {
+            'id': product_id,
+            'title': title,  # Original title without Shaymee prefix
+            'price': price_str,
+            'original_price': original_price,
+            'margin': LISTING_MARGIN,
+            'image_filename': '',
+            'productUrl': product.get('productUrl', ''),
+            'description': f"{title} - Calidad premium garantizada",
+            'category': category,
+            'source': 'Pequeño Mundo',
+            'brand': 'Shaymee',
+            'whatsapp_ready': True,
+            'features': [
+                "✓ Calidad premium",
+                "✓ Envío rápido y seguro",
+                "✓ Garantía de satisfacción"
+            ]
+        }
+    
+    async def _generate_marketplace_data(self, rebranded_products, columns=None):
         """Generate marketplace-ready data with WhatsApp messages"""
         
         if not rebranded_products:
             print("😞 No rebranded products to process")
             return None, None
+        columns = columns or ProductColumns.from_products(rebranded_products)
         
         # Create timestamp
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
         # Group by category
-        by_category = {}
-        for product in rebranded_products:
-            category = product.get('category', 'general')
-            if category not in by_category:
-                by_category[category] = []
+        by_category = defaultdict(list)
+        for category, product in zip(columns.categories, rebranded_products):
             by_category[category].append(product)
         
-        print(f"📦 Marketplace catalog generated:")
-        for category, products in by_category.items():
-            print(f"   📂 {category}: {len(products)} products")
+        print("\n".join(["📦 Marketplace catalog generated:"] + [
+            f"   📂 {category}: {len(products)} products"
+            for category, products in by_category.items()
+        ]))
         
         # Save catalog
         catalog = {
@@ -363,29 +692,27 @@ class AutomaticPipeline:
         }
         
         catalog_filename = f"shaymee_catalog_{timestamp}.json"
-        with open(catalog_filename, 'w', encoding='utf-8') as f:
-            json.dump(catalog, f, ensure_ascii=False, indent=2)
+        if HAS_ORJSON:
+            with open(catalog_filename, 'wb') as f:
+                f.write(orjson.dumps(catalog, option=orjson.OPT_INDENT_2))
+        else:
+            with open(catalog_filename, 'w', encoding='utf-8') as f:
+                json.dump(catalog, f, ensure_ascii=False, indent=2)
         
         # Generate WhatsApp messages
         whatsapp_messages = []
-        for idx, product in enumerate(rebranded_products, 1):
+        for product, price, crc_price in zip(rebranded_products, columns.prices, columns.original_prices):
             # Format price with thousands separator
-            try:
-                price = float(product['price'].replace('$', '').replace(',', ''))
-                formatted_price = f"${price:,.2f}".replace(',', ' ').replace('.', ',').replace(' ', '.')
-            except:
+            if price is not None:
+                formatted_price = format_usd(price)
+            else:
                 formatted_price = product['price']
                 
             # Format original price if available
-            original_price = product.get('original_price', '')
-            if original_price and original_price.startswith('₡'):
-                try:
-                    crc_price = float(original_price.replace('₡', '').replace(',', '').strip())
-                    formatted_original = f"₡{crc_price:,.0f}".replace(',', '.')
-                except:
-                    formatted_original = original_price
+            if crc_price is not None:
+                formatted_original = format_crc(crc_price)
             else:
-                formatted_original = original_price
+                formatted_original = product.get('original_price', '')
             
             # Build features list
             features = "\n".join([f"• {f}" for f in product.get('features', [])])
@@ -413,78 +740,64 @@ class AutomaticPipeline:
         # Save WhatsApp messages
         whatsapp_filename = f"whatsapp_messages_{timestamp}.txt"
         with open(whatsapp_filename, 'w', encoding='utf-8') as f:
-            for item in whatsapp_messages:
-                f.write(f"=== {item['id']} ===\n")
-                f.write(f"Categoría: {item['category']}\n")
-                f.write(f"Imagen: {item.get('image', 'N/A')}\n")
-                f.write("-" * 40 + "\n")
-                f.write(item['message'])
-                f.write("\n\n")
-        
-        print(f"💾 Catalog saved: {catalog_filename}")
-        print(f"📱 WhatsApp messages: {whatsapp_filename}")
+            f.write("".join([
+                f"=== {item['id']} ===\n"
+                f"Categoría: {item['category']}\n"
+                f"Imagen: {item.get('image', 'N/A')}\n"
+                f"{MESSAGE_DIVIDER}\n"
+                f"{item['message']}\n\n"
+                for item in whatsapp_messages
+            ]))
+        
+        print(f"💾 Catalog saved: {catalog_filename}\n"
+              f"📱 WhatsApp messages: {whatsapp_filename}")
         
         return catalog, whatsapp_messages
     
-    def _generate_business_analytics(self, rebranded_products):
+    def _generate_business_analytics(self, rebranded_products, columns=None):
         """Generate business analytics and insights"""
         
         if not rebranded_products:
             print("📊 No products for analytics")
             return
+        columns = columns or ProductColumns.from_products(rebranded_products)
         
         # Calculate metrics
         total_products = len(rebranded_products)
         
-        # Margins
-        margins = []
-        for product in rebranded_products:
-            try:
-                margin = float(product.get('margin', '0'))
-                margins.append(margin)
-            except:
-                continue
+        # Margins, prices and categories come pre-parsed from the columns
+        margins = [m for m in columns.margins if m is not None]
+        prices = [p for p in columns.prices if p is not None]
+        categories = Counter(columns.categories)
         
         avg_margin = sum(margins) / len(margins) if margins else 0
-        
-        # Prices
-        prices = []
-        for product in rebranded_products:
-            try:
-                price_str = product.get('price', '$0').replace('$', '')
-                price = float(price_str)
-                prices.append(price)
-            except:
-                continue
-        
         avg_price = sum(prices) / len(prices) if prices else 0
         
-        # Categories
-        categories = {}
-        for product in rebranded_products:
-            cat = product.get('category', 'general')
-            categories[cat] = categories.get(cat, 0) + 1
-        
-        print(f"💼 SHAYMEE BUSINESS ANALYTICS")
-        print(f"   📊 Total products ready: {total_products}")
-        print(f"   📈 Average margin: {avg_margin:.1f}%")
-        print(f"   💰 Average price: ${avg_price:.2f}")
-        print(f"   📂 Categories:")
-        for cat, count in categories.items():
-            print(f"      - {cat}: {count} products")
+        report = [
+            "💼 SHAYMEE BUSINESS ANALYTICS",
+            f"   📊 Total products ready: {total_products}",
+            f"   📈 Average margin: {avg_margin:.1f}%",
+            f"   💰 Average price: ${avg_price:.2f}",
+            "   📂 Categories:",
+        ]
+        report.extend(f"      - {cat}: {count} products" for cat, count in categories.items())
         
         # Revenue projection
         if prices:
             daily_orders = 5  # Conservative estimate
-            monthly_revenue = sum(prices) * daily_orders * 30 / len(prices)
-            print(f"   💵 Monthly revenue potential: ${monthly_revenue:.2f}")
-        
-        print(f"\n🎯 NEXT STEPS:")
-        print(f"   1. ✅ Products scraped and rebranded")
-        print(f"   2. ✅ Catalog and WhatsApp messages ready") 
-        print(f"   3. 🔄 Deploy to WhatsApp Business API")
-        print(f"   4. 📈 Start marketing and taking orders")
-        print(f"   5. 🔄 Scale scraping to more categories")
+            monthly_revenue = avg_price * daily_orders * 30
+            report.append(f"   💵 Monthly revenue potential: ${monthly_revenue:.2f}")
+        
+        report += [
+            "\n🎯 NEXT STEPS:",
+            "   1. ✅ Products scraped and rebranded",
+            "   2. ✅ Catalog and WhatsApp messages ready",
+            "   3. 🔄 Deploy to WhatsApp Business API",
+            "   4. 📈 Start marketing and taking orders",
+            "   5. 🔄 Scale scraping to more categories",
+        ]
+        # One write for the whole report instead of a print per line
+        print("\n".join(report))
 
 async def main():
     """Run the complete automatic pipeline"""
@@ -493,4 +806,6 @@ async def main():
     await pipeline.run_complete_pipeline()
 
 if __name__ == "__main__":
+    if HAS_UVLOOP:
+        uvloop.install()
     asyncio.run(main())
@@ -6,12 +6,15 @@ Shows the full power of the Shaymee rebranding system across different toy categ
 
 import asyncio
 import os
+import sys
 from dotenv import load_dotenv
 from loguru import logger
 from integrations.product_rebrander import ProductRebrander
 
-# Configure logging
-logger.add("complete_juguetes_demo.log", rotation="500 MB", level="INFO")
+# Configure logging; enqueued sinks format and write on loguru's background thread
+logger.remove()
+logger.add(sys.stderr, level="INFO", enqueue=True)
+logger.add("complete_juguetes_demo.log", rotation="500 MB", level="INFO", enqueue=True)
 
 # Diverse toy mock data representing different categories
 TOY_CATEGORIES = {
@@ -158,8 +161,16 @@ async def demo_complete_rebranding():
     logger.info("=" * 70)
     
     total_toys = len(all_rebranded_toys)
-    overall_cost = sum(category_stats[cat]['cost'] for cat in category_stats)
-    overall_revenue = sum(category_stats[cat]['revenue'] for cat in category_stats)
+    # Totals and best/worst performers in a single pass over the stats
+    overall_cost = overall_revenue = 0
+    best_category = worst_category = None
+    for category, stats in category_stats.items():
+        overall_cost += stats['cost']
+        overall_revenue += stats['revenue']
+        if best_category is None or stats['margin'] > best_category[1]['margin']:
+            best_category = (category, stats)
+        if worst_category is None or stats['margin'] < worst_category[1]['margin']:
+            worst_category = (category, stats)
     overall_profit = overall_revenue - overall_cost
     overall_margin = (overall_profit / overall_revenue * 100) if overall_revenue > 0 else 0
     
@@ -178,9 +189,6 @@ async def demo_complete_rebranding():
                    f"{stats['margin']:5.1f}% margin")
     
     # Best and worst performers
-    best_category = max(category_stats.items(), key=lambda x: x[1]['margin'])
-    worst_category = min(category_stats.items(), key=lambda x: x[1]['margin'])
-    
     logger.info(f"\n🏆 Best Category: {best_category[0].capitalize()} ({best_category[1]['margin']:.1f}% margin)")
     logger.info(f"📉 Focus Area: {worst_category[0].capitalize()} ({worst_category[1]['margin']:.1f}% margin)")
     
@@ -191,15 +199,20 @@ async def demo_complete_rebranding():
         cache_dir = f"image_cache/{category}"
         
         if os.path.exists(processed_dir):
-            batches = len([d for d in os.listdir(processed_dir) if os.path.isdir(os.path.join(processed_dir, d))])
+            with os.scandir(processed_dir) as entries:
+                batches = sum(1 for entry in entries if entry.is_dir())
             logger.info(f"  📂 {category}: {batches} processing batches")
         
         if os.path.exists(cache_dir):
-            cached_files = len([f for f in os.listdir(cache_dir) if f.endswith('.jpg')])
+            with os.scandir(cache_dir) as entries:
+                cached_files = sum(1 for entry in entries if entry.name.endswith('.jpg'))
             logger.info(f"  🗂️  {category}: {cached_files} cached images")
     
     logger.success(f"\n🎉 DEMO COMPLETE! Shaymee processed {total_toys} toys across {len(category_stats)} categories")
     logger.info(f"💡 Ready for WhatsApp integration and customer orders!")
+    
+    # Let the background sink thread drain before the demo exits
+    await logger.complete()
 
 if __name__ == "__main__":
     asyncio.run(demo_complete_rebranding())
@@ -9,18 +9,41 @@ import os
 import textwrap
 import sys
 import json
-from glob import glob
-from PIL import Image
+
+# orjson parses the catalog considerably faster than the stdlib json decoder
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+# Pillow recompresses images before embedding; without it they are embedded as-is
+try:
+    from PIL import Image  # type: ignore
+    HAS_PIL = True
+except Exception:
+    HAS_PIL = False
 
 # Check if we need to use the legacy FPDF version
 USE_LEGACY = FPDF_VERSION < '2.0.0'
 
+# Product image extensions, in order of preference
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Embedded images are 100 mm wide, so ~600 px is 150 dpi on the page
+PREVIEW_IMAGE_WIDTH = 600
+PREVIEW_JPEG_QUALITY = 72
+
 def find_latest_catalog():
     """Find the most recent catalog JSON file"""
-    catalog_files = glob('shaymee_catalog_*.json')
-    if not catalog_files:
-        return None
-    return max(catalog_files, key=os.path.getmtime)
+    # One pass over the directory; DirEntry.stat() is a single call per entry
+    latest, latest_mtime = None, -1.0
+    for entry in os.scandir('.'):
+        if entry.name.startswith('shaymee_catalog_') and entry.name.endswith('.json'):
+            mtime = entry.stat().st_mtime
+            if mtime > latest_mtime:
+                latest, latest_mtime = entry.name, mtime
+    return latest
 
 class PDF(FPDF):
     def __init__(self, *args, **kwargs):
@@ -46,6 +69,9 @@ class PDF(FPDF):
         self.cell(0, 10, f'Página {self.page_no()}/{{nb}}', 0, 0, 'C')
 
 class WhatsAppPreviewGenerator:
+    # Chat bubble lines wrap at 80 characters
+    _WRAPPER = textwrap.TextWrapper(width=80)
+    
     def __init__(self):
         self.pdf = PDF()
         self.pdf.set_auto_page_break(auto=True, margin=15)
@@ -57,8 +83,12 @@ class WhatsAppPreviewGenerator:
         if not catalog_file:
             raise FileNotFoundError("No catalog file found. Please run the pipeline first to generate product data.")
             
-        with open(catalog_file, 'r', encoding='utf-8') as f:
-            catalog = json.load(f)
+        if HAS_ORJSON:
+            with open(catalog_file, 'rb') as f:
+                catalog = orjson.loads(f.read())
+        else:
+            with open(catalog_file, 'r', encoding='utf-8') as f:
+                catalog = json.load(f)
             
         self.sample_products = []
         for product in catalog['products'][:5]:  # Use first 5 products
@@ -75,21 +105,52 @@ class WhatsAppPreviewGenerator:
         # Create images directory if it doesn't exist
         self.images_dir = 'product_images'
         os.makedirs(self.images_dir, exist_ok=True)
+        self.previews_dir = os.path.join(self.images_dir, '.previews')
+        
+        # Index the images once (name without extension -> path) instead of probing per product
+        self._image_index = {}
+        for entry in sorted(os.scandir(self.images_dir), key=self._image_priority):
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in IMAGE_EXTENSIONS:
+                self._image_index.setdefault(stem, entry.path)
+    
+    @staticmethod
+    def _image_priority(entry):
+        """Prefer .jpg, then .jpeg, then .png when a product has several images"""
+        ext = os.path.splitext(entry.name)[1].lower()
+        return IMAGE_EXTENSIONS.index(ext) if ext in IMAGE_EXTENSIONS else len(IMAGE_EXTENSIONS)
+    
+    def _get_preview_image(self, image_path):
+        """Downscaled, recompressed JPEG copy of an image for embedding in the PDF"""
+        if not HAS_PIL:
+            return image_path
+        
+        # Keyed by the source's mtime and size, so re-runs reuse the encoded copy
+        stat = os.stat(image_path)
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        preview_path = os.path.join(self.previews_dir, f"{stem}_{stat.st_mtime_ns}_{stat.st_size}.jpg")
+        if os.path.exists(preview_path):
+            return preview_path
+        
+        os.makedirs(self.previews_dir, exist_ok=True)
+        with Image.open(image_path) as img:
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            if img.width > PREVIEW_IMAGE_WIDTH:
+                height = round(img.height * PREVIEW_IMAGE_WIDTH / img.width)
+                img = img.resize((PREVIEW_IMAGE_WIDTH, height), Image.LANCZOS)
+            tmp_path = preview_path + '.part'
+            img.save(tmp_path, 'JPEG', quality=PREVIEW_JPEG_QUALITY, optimize=True)
+        os.replace(tmp_path, preview_path)
+        return preview_path
         
     def _get_product_image(self, product):
         """Get the product image path"""
-        # Try to find the image in the product_images directory
-        image_path = os.path.join('product_images', f"{product['id']}.jpg")
-        
-        # If the image exists, return its path
-        if os.path.exists(image_path):
-            return image_path
-            
-        # If not, try to find any image with the product ID in the filename
-        for ext in ['.jpg', '.jpeg', '.png']:
-            image_path = os.path.join('product_images', f"{product['id']}{ext}")
-            if os.path.exists(image_path):
-                return image_path
+        # The catalog names the downloaded image; older images are named after the product ID
+        downloaded = os.path.splitext(os.path.basename(product.get('image_filename') or ''))[0]
+        for name in (downloaded, product['id']):
+            if name and name in self._image_index:
+                return self._image_index[name]
                 
         # If no image found, return None
         print(f"  ⚠️ Image not found for product: {product['id']}")
@@ -131,12 +192,11 @@ class WhatsAppPreviewGenerator:
         text_lines = text.split('\n')
         line_height = 8
         padding = 10
-        max_width = 80  # Characters per line
         
         # Wrap long lines
         wrapped_lines = []
         for line in text_lines:
-            wrapped_lines.extend(textwrap.wrap(line, width=max_width))
+            wrapped_lines.extend(self._WRAPPER.wrap(line))
         
         # Calculate bubble dimensions
         text_height = len(wrapped_lines) * line_height
@@ -154,23 +214,24 @@ class WhatsAppPreviewGenerator:
         current_x = self.pdf.get_x()
         current_y = self.pdf.get_y()
         
+        # Only switch fonts when the weight actually changes
+        current_bold = False
+        self.pdf.set_font('DejaVu', '', 12)
+        
         for line in wrapped_lines:
-            parts = line.split('*')
-            is_bold = False
-            
-            for i, part in enumerate(parts):
+            # Odd-numbered parts of a '*'-split line are the bold ones
+            for i, part in enumerate(line.split('*')):
                 if part.strip() == '':
                     continue
-                    
-                if is_bold:
-                    self.pdf.set_font('DejaVu', 'B', 12)
-                else:
-                    self.pdf.set_font('DejaVu', '', 12)
+                
+                is_bold = i % 2 == 1
+                if is_bold != current_bold:
+                    self.pdf.set_font('DejaVu', 'B' if is_bold else '', 12)
+                    current_bold = is_bold
                 
                 self.pdf.cell(0, line_height, part, ln=0)
-                is_bold = not is_bold
             
-            self.pdf.ln(line_height)
+            # Next line starts back at the bubble's left padding
             current_y += line_height
             self.pdf.set_xy(current_x, current_y)
         
@@ -178,25 +239,17 @@ class WhatsAppPreviewGenerator:
     
     def generate_pdf(self, filename='whatsapp_preview.pdf'):
         """Generate the PDF with sample WhatsApp conversations"""
-        self.pdf.add_page()
-        
-        # Title is now in the header
+        # Title is in the header
         self.pdf.add_page()
         
         # Add sample conversations
         for i, product in enumerate(self.sample_products, 1):
             # Add product image if available
             image_path = self._get_product_image(product)
-            if image_path and os.path.exists(image_path):
+            if image_path:
                 try:
-                    # Resize image to fit PDF
-                    img = Image.open(image_path)
-                    width, height = img.size
-                    aspect_ratio = width / height
-                    new_width = 100  # 100mm width
-                    new_height = new_width / aspect_ratio
-                    
-                    self.pdf.image(image_path, x=10, w=new_width, h=new_height)
+                    # 100mm wide; fpdf keeps the aspect ratio when only the width is given
+                    self.pdf.image(self._get_preview_image(image_path), x=10, w=100)
                     self.pdf.ln(5)
                 except Exception as e:
                     print(f"  ⚠️ Could not add image {image_path}: {e}")
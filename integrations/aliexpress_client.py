@@ -1,16 +1,90 @@
 import asyncio
 import aiohttp
 import random
+import time
 from typing import Any, Dict, List, Optional
 from loguru import logger
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import soupsieve
 from urllib.parse import quote_plus
 import json
 import re
 
+# orjson decodes the multi-MB runParams payload considerably faster than the stdlib json
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    HAS_ORJSON = False
+
+# Search pages embed their results as a JSON object assigned to window.runParams
+# (matched on the raw response bytes, so the page is never decoded for the fast path)
+RUNPARAMS_RE = re.compile(rb'window\.runParams\s*=\s*({.*?});', re.DOTALL)
+RUNPARAMS_MARKER = b'window.runParams'
+
+# The JSON fast path only needs the page's <script> elements
+SCRIPT_ONLY = SoupStrainer('script')
+
+# CSS selectors for the HTML fallbacks, compiled once and tried in priority order
+TITLE_SELECTORS = tuple(soupsieve.compile(s) for s in ('h1', 'h2', 'h3', '.title', '[title]', 'a'))
+PRICE_SELECTORS = tuple(soupsieve.compile(s) for s in ('.price', '.cost', '[class*="price"]', '[class*="cost"]'))
+IMAGE_SELECTOR = soupsieve.compile('img')
+LINK_SELECTOR = soupsieve.compile('a')
+
+# Price indicators ($, €, £, usd, price, cost) or product indicators (buy, add to cart,
+# order, shipping) in an element's text, matched in a single case-insensitive scan
+PRODUCT_HINT_RE = re.compile(r'[$€£]|usd|price|cost|buy|add to cart|order|shipping', re.IGNORECASE)
+# Characters of an element's text to scan for those hints before giving up
+PRODUCT_HINT_SCAN_CHARS = 2048
+
+# Braces and whole string literals, so braces inside strings are skipped in one match
+_JSON_BRACE_RE = re.compile(rb'"(?:[^"\\]|\\.)*"|[{}]', re.DOTALL)
+
+def _dig(data: Any, *keys: str, default: Any = None) -> Any:
+    """Follow `keys` through nested dicts, returning `default` where the path breaks"""
+    for key in keys:
+        data = data.get(key) if isinstance(data, dict) else None
+        if data is None:
+            return default
+    return data
+
+def extract_runparams_json(text: bytes) -> Optional[bytes]:
+    """
+    Return the object literal assigned to window.runParams in `text`.
+
+    The closing brace is found by counting brace depth in a single forward
+    scan, so there is no backtracking over large scripts; falls back to
+    RUNPARAMS_RE when the assignment does not have the expected shape.
+    """
+    marker = text.find(RUNPARAMS_MARKER)
+    if marker == -1:
+        return None
+    start = text.find(b'{', marker)
+    if start != -1 and text[marker + len(RUNPARAMS_MARKER):start].strip() == b'=':
+        depth = 0
+        for match in _JSON_BRACE_RE.finditer(text, start):
+            token = match.group()
+            if token == b'{':
+                depth += 1
+            elif token == b'}':
+                depth -= 1
+                if depth == 0:
+                    return text[start:match.end()]
+    
+    json_match = RUNPARAMS_RE.search(text, marker)
+    return json_match.group(1) if json_match else None
+
 class AliExpressClient:
     def __init__(self, timeout: int = 45):
         self.timeout = timeout
+        self.session = None
+        self._owns_session = True
+        
+        # Searches are spaced 1-3 s apart; the first one goes out immediately.
+        # The lock is created in _pace, inside the running loop (on Python 3.9 a
+        # Lock built here would bind to whatever loop get_event_loop() returns)
+        self._pace_lock: Optional[asyncio.Lock] = None
+        self._next_request_at = 0.0
         self.base_url = "https://www.aliexpress.com"
         self.search_url = "https://www.aliexpress.com/wholesale"
         
@@ -34,6 +108,53 @@ class AliExpressClient:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
         ]
+        
+        # Full header set for each user agent, built once
+        self._header_variants = [{**self.headers, 'User-Agent': ua} for ua in self.user_agents]
+
+    def use_session(self, session: aiohttp.ClientSession):
+        """Use a shared HTTP session (its owner closes it)"""
+        self.session = session
+        self._owns_session = False
+
+    async def __aenter__(self):
+        """Context manager entry"""
+        self._get_session()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        await self.close()
+
+    async def close(self):
+        """Close the session if this client created it"""
+        if self.session and self._owns_session:
+            await self.session.close()
+            self.session = None
+
+    async def _pace(self):
+        """
+        Wait until at least 1-3 s (random) after the previous search started, so
+        concurrent callers share one politeness budget instead of each sleeping
+        """
+        if self._pace_lock is None:
+            self._pace_lock = asyncio.Lock()
+        async with self._pace_lock:
+            delay = self._next_request_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next_request_at = time.monotonic() + random.uniform(1, 3)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Return the client's session, creating it on first use so every search
+        reuses the same keep-alive connections instead of reconnecting
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=100, limit_per_host=10, ttl_dns_cache=300, keepalive_timeout=75)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self._owns_session = True
+        return self.session
 
     async def get_products(self, search_term: str, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
         """
@@ -47,34 +168,34 @@ class AliExpressClient:
             search_url = f"{self.search_url}?SearchText={encoded_term}&SortType=total_tranpro_desc"
             
             # Prepare headers with random user agent
-            headers = self.headers.copy()
-            headers['User-Agent'] = random.choice(self.user_agents)
+            headers = random.choice(self._header_variants)
             
-            # Create session with timeout
             timeout = aiohttp.ClientTimeout(total=self.timeout)
+            session = self._get_session()
+            
+            # Add random delay to avoid rate limiting
+            await self._pace()
             
-            async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                # Add random delay to avoid rate limiting
-                await asyncio.sleep(random.uniform(1, 3))
+            async with session.get(search_url, headers=headers, timeout=timeout) as response:
+                if response.status != 200:
+                    logger.error(f"❌ AliExpress returned status {response.status}")
+                    return None
                 
-                async with session.get(search_url) as response:
-                    if response.status != 200:
-                        logger.error(f"❌ AliExpress returned status {response.status}")
-                        return None
-                    
-                    html_content = await response.text()
-                    logger.info(f"📄 Received {len(html_content)} characters from AliExpress")
-                    
-                    # Parse products
-                    products = await self._parse_products(html_content, limit)
+                # Raw (already decompressed) bytes: lxml detects the encoding itself,
+                # so the page is never decoded into a str and copied again
+                html_content = await response.read()
+                logger.info(f"📄 Received {len(html_content)} bytes from AliExpress")
+                
+                # Parse products
+                products = await self._parse_products(html_content, limit)
+                
+                if products:
+                    logger.info(f"✅ Found {len(products)} products from AliExpress")
+                    return products
+                else:
+                    logger.warning("⚠️ No products found in AliExpress response")
+                    return []
                     
-                    if products:
-                        logger.info(f"✅ Found {len(products)} products from AliExpress")
-                        return products
-                    else:
-                        logger.warning("⚠️ No products found in AliExpress response")
-                        return []
-                        
         except asyncio.TimeoutError:
             logger.error(f"⏰ AliExpress request timed out after {self.timeout}s")
             return None
@@ -82,45 +203,60 @@ class AliExpressClient:
             logger.error(f"💥 AliExpress scraping failed: {e}")
             return None
 
-    async def _parse_products(self, html_content: str, limit: int) -> List[Dict[str, Any]]:
+    async def _parse_products(self, html_content: bytes, limit: int) -> List[Dict[str, Any]]:
         """
         Parse product information from AliExpress HTML
         """
         products = []
         
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
             # AliExpress often loads content via JavaScript, so we'll try multiple approaches
             
-            # Method 1: Try to find JSON data in script tags
-            script_tags = soup.find_all('script', type='text/javascript')
-            for script in script_tags:
-                if script.string and 'window.runParams' in script.string:
-                    # Extract JSON data from the script
-                    try:
-                        json_match = re.search(r'window\.runParams\s*=\s*({.*?});', script.string, re.DOTALL)
-                        if json_match:
-                            json_data = json.loads(json_match.group(1))
-                            products.extend(self._extract_from_json(json_data, limit))
+            # Method 1: Try to find JSON data in script tags, first straight from
+            # the raw HTML without parsing it at all
+            products.extend(self._extract_from_runparams(html_content, limit))
+            
+            # Then script by script (parsing nothing but the scripts), in case the
+            # first mention of runParams in the page is not the assignment
+            if not products and RUNPARAMS_MARKER in html_content:
+                scripts = BeautifulSoup(html_content, 'lxml', parse_only=SCRIPT_ONLY)
+                script_tags = scripts.find_all('script', type='text/javascript')
+                for script in script_tags:
+                    script_text = script.string.encode('utf-8') if script.string else b''
+                    if RUNPARAMS_MARKER in script_text:
+                        products.extend(self._extract_from_runparams(script_text, limit))
+                        if products:
                             break
-                    except Exception as e:
-                        logger.debug(f"Failed to parse JSON from script: {e}")
-                        continue
             
-            # Method 2: Try to find product cards in HTML (fallback)
             if not products:
+                # The HTML fallbacks need the full document tree
+                soup = BeautifulSoup(html_content, 'lxml')
+                
+                # Method 2: Try to find product cards in HTML (fallback)
                 products.extend(self._extract_from_html(soup, limit))
-            
-            # Method 3: Look for specific AliExpress product selectors
-            if not products:
-                products.extend(self._extract_with_selectors(soup, limit))
+                
+                # Method 3: Look for specific AliExpress product selectors
+                if not products:
+                    products.extend(self._extract_with_selectors(soup, limit))
                 
         except Exception as e:
             logger.error(f"Error parsing AliExpress HTML: {e}")
         
         return products[:limit]
 
+    def _extract_from_runparams(self, text: bytes, limit: int) -> List[Dict[str, Any]]:
+        """
+        Extract products from the window.runParams object in `text`, if any
+        """
+        try:
+            json_text = extract_runparams_json(text)
+            if json_text:
+                json_data = orjson.loads(json_text) if HAS_ORJSON else json.loads(json_text)
+                return self._extract_from_json(json_data, limit)
+        except Exception as e:
+            logger.debug(f"Failed to parse JSON from script: {e}")
+        return []
+
     def _extract_from_json(self, json_data: Dict, limit: int) -> List[Dict[str, Any]]:
         """
         Extract products from JSON data found in scripts
@@ -151,13 +287,13 @@ class AliExpressClient:
         """
         try:
             product = {
-                'title': item.get('title', {}).get('displayTitle', 'No title'),
+                'title': _dig(item, 'title', 'displayTitle', default='No title'),
                 'price': self._extract_price_from_json(item),
                 'image_url': self._extract_image_from_json(item),
                 'product_url': self._extract_url_from_json(item),
-                'rating': item.get('evaluation', {}).get('starRating', 0),
-                'orders': item.get('trade', {}).get('tradeDesc', '0'),
-                'shipping': item.get('logistics', {}).get('logisticsDesc', 'Unknown')
+                'rating': _dig(item, 'evaluation', 'starRating', default=0),
+                'orders': _dig(item, 'trade', 'tradeDesc', default='0'),
+                'shipping': _dig(item, 'logistics', 'logisticsDesc', default='Unknown')
             }
             
             # Validate required fields
@@ -258,17 +394,16 @@ class AliExpressClient:
         """
         Check if an element looks like it contains product information
         """
-        text = element.get_text().lower()
-        
-        # Look for price indicators
-        price_indicators = ['$', '€', '£', 'usd', 'price', 'cost']
-        has_price = any(indicator in text for indicator in price_indicators)
-        
-        # Look for product indicators
-        product_indicators = ['buy', 'add to cart', 'order', 'shipping']
-        has_product_info = any(indicator in text for indicator in product_indicators)
-        
-        return has_price or has_product_info
+        # Scan the element's text piece by piece, without joining it into one
+        # string, and give up once the first few KB show no hint
+        scanned = 0
+        for text in element.strings:
+            if PRODUCT_HINT_RE.search(text):
+                return True
+            scanned += len(text)
+            if scanned > PRODUCT_HINT_SCAN_CHARS:
+                break
+        return False
 
     def _parse_html_product(self, element) -> Optional[Dict[str, Any]]:
         """
@@ -276,22 +411,20 @@ class AliExpressClient:
         """
         try:
             # Extract title
-            title_selectors = ['h1', 'h2', 'h3', '.title', '[title]', 'a']
             title = 'No title'
             
-            for selector in title_selectors:
-                title_elem = element.select_one(selector)
+            for selector in TITLE_SELECTORS:
+                title_elem = selector.select_one(element)
                 if title_elem:
                     title = title_elem.get('title') or title_elem.get_text().strip()
                     if title and len(title) > 5:  # Reasonable title length
                         break
             
             # Extract price
-            price_selectors = ['.price', '.cost', '[class*="price"]', '[class*="cost"]']
             price = 'N/A'
             
-            for selector in price_selectors:
-                price_elem = element.select_one(selector)
+            for selector in PRICE_SELECTORS:
+                price_elem = selector.select_one(element)
                 if price_elem:
                     price_text = price_elem.get_text().strip()
                     if any(char in price_text for char in ['$', '€', '£']):
@@ -299,7 +432,7 @@ class AliExpressClient:
                         break
             
             # Extract image
-            img_elem = element.select_one('img')
+            img_elem = IMAGE_SELECTOR.select_one(element)
             image_url = ''
             if img_elem:
                 image_url = img_elem.get('src') or img_elem.get('data-src') or ''
@@ -310,7 +443,7 @@ class AliExpressClient:
                         image_url = f"{self.base_url}{image_url}"
             
             # Extract product URL
-            link_elem = element.select_one('a')
+            link_elem = LINK_SELECTOR.select_one(element)
             product_url = ''
             if link_elem:
                 product_url = link_elem.get('href', '')
@@ -345,23 +478,22 @@ async def test_aliexpress_client():
     """
     Test the AliExpress client
     """
-    client = AliExpressClient()
-    
     search_terms = ['phone case', 'bluetooth headphones', 'laptop stand']
     
-    for term in search_terms:
-        logger.info(f"🧪 Testing search for: {term}")
-        products = await client.get_products(term, limit=5)
-        
-        if products:
-            logger.info(f"✅ Found {len(products)} products for '{term}'")
-            for i, product in enumerate(products, 1):
-                logger.info(f"  {i}. {product['title'][:50]}... - {product['price']}")
-        else:
-            logger.warning(f"⚠️ No products found for '{term}'")
-        
-        # Small delay between searches
-        await asyncio.sleep(2)
+    async with AliExpressClient() as client:
+        for term in search_terms:
+            logger.info(f"🧪 Testing search for: {term}")
+            products = await client.get_products(term, limit=5)
+            
+            if products:
+                logger.info(f"✅ Found {len(products)} products for '{term}'")
+                for i, product in enumerate(products, 1):
+                    logger.info(f"  {i}. {product['title'][:50]}... - {product['price']}")
+            else:
+                logger.warning(f"⚠️ No products found for '{term}'")
+            
+            # Small delay between searches
+            await asyncio.sleep(2)
 
 
 if __name__ == "__main__":
@@ -45,6 +45,7 @@ class CorreosClient:
         self.api_key = api_key
         self.base_url = base_url
         self.session = None
+        self._owns_session = True
         self.use_api = api_key is not None
         
         # URLs de Correos de Costa Rica
@@ -53,15 +54,23 @@ class CorreosClient:
         
         logger.info(f"CorreosClient initialized in {'API' if self.use_api else 'Web Automation'} mode")
     
+    def use_session(self, session: aiohttp.ClientSession):
+        """Usar una sesión HTTP compartida (el dueño de la sesión la cierra)"""
+        self.session = session
+        self._owns_session = False
+    
     async def __aenter__(self):
         """Context manager entry"""
-        self.session = aiohttp.ClientSession()
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
+            self.session = None
     
     async def create_pickup_order(self, package_info: PackageInfo, pickup_date: datetime = None) -> PickupOrder:
         """
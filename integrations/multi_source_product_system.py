@@ -76,6 +76,18 @@ class MultiSourceProductSystem:
         
         logger.info("🚀 Multi-Source Product System initialized")
 
+    async def __aenter__(self):
+        """Context manager entry"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Context manager exit"""
+        await self.close()
+
+    async def close(self):
+        """Close the scrapers' HTTP sessions (the AliExpress client keeps one open between searches)"""
+        await self.aliexpress_client.close()
+
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file or use defaults"""
         try:
@@ -504,26 +516,25 @@ async def test_multi_source_system():
     """Test the multi-source product system"""
     logger.info("🧪 Testing Multi-Source Product System...")
     
-    system = MultiSourceProductSystem()
-    
-    # Test search
-    products = await system.search_products("phone case", limit=10)
-    
-    if products:
-        print(f"✅ Found {len(products)} products:")
-        for i, product in enumerate(products, 1):
-            print(f"{i}. {product.title}")
-            print(f"   Source: {product.source}")
-            print(f"   Price: {product.price}")
-            print(f"   Confidence: {product.confidence_score:.2f}")
-            print()
-    else:
-        print("❌ No products found")
-    
-    # Show system stats
-    stats = system.get_system_stats()
-    print("📊 System Statistics:")
-    print(json.dumps(stats, indent=2))
+    async with MultiSourceProductSystem() as system:
+        # Test search
+        products = await system.search_products("phone case", limit=10)
+        
+        if products:
+            print(f"✅ Found {len(products)} products:")
+            for i, product in enumerate(products, 1):
+                print(f"{i}. {product.title}")
+                print(f"   Source: {product.source}")
+                print(f"   Price: {product.price}")
+                print(f"   Confidence: {product.confidence_score:.2f}")
+                print()
+        else:
+            print("❌ No products found")
+        
+        # Show system stats
+        stats = system.get_system_stats()
+        print("📊 System Statistics:")
+        print(json.dumps(stats, indent=2))
 
 if __name__ == "__main__":
     asyncio.run(test_multi_source_system())
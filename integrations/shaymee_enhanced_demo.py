@@ -143,11 +143,12 @@ async def main():
     """
     demo = ShaymeeEnhancedDemo()
     
-    # Run the enhanced scraping demo
-    enhanced_products = await demo.demonstrate_enhanced_scraping()
-    
-    # Run category analysis
-    await demo.demonstrate_category_analysis()
+    async with demo.product_system:
+        # Run the enhanced scraping demo
+        enhanced_products = await demo.demonstrate_enhanced_scraping()
+        
+        # Run category analysis
+        await demo.demonstrate_category_analysis()
     
     # Final summary
     logger.info("\n🎉 DEMO COMPLETE!")
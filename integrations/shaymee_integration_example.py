@@ -160,6 +160,8 @@ async def demo_shaymee_integration():
     
     health_report = await agent.get_system_health()
     print(health_report)
+    
+    await agent.product_system.close()
 
 
 if __name__ == "__main__":
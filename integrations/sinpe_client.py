@@ -64,6 +64,7 @@ class SinpeClient:
         self.merchant_id = merchant_id
         self.base_url = base_url
         self.session = None
+        self._owns_session = True
         self.use_api = api_key is not None and merchant_id is not None
         
         # Configuración por defecto
@@ -72,15 +73,23 @@ class SinpeClient:
         
         logger.info(f"SinpeClient initialized in {'API' if self.use_api else 'Payment Link'} mode")
     
+    def use_session(self, session: aiohttp.ClientSession):
+        """Usar una sesión HTTP compartida (el dueño de la sesión la cierra)"""
+        self.session = session
+        self._owns_session = False
+    
     async def __aenter__(self):
         """Context manager entry"""
-        self.session = aiohttp.ClientSession()
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._owns_session = True
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Context manager exit"""
-        if self.session:
+        if self.session and self._owns_session:
             await self.session.close()
+            self.session = None
     
     async def create_payment_link(self, payment_request: PaymentRequest) -> PaymentLink:
         """
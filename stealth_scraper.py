@@ -328,13 +328,30 @@ async def main():
     
     all_products = []
     
-    for term in search_terms:
-        print(f"\n🎯 Scraping: '{term}'")
-        print("-" * 30)
-        
-        products = await scraper.bypass_cloudflare_and_scrape(term)
-        
-        if products:
+    # Scrape up to 4 terms at once, but space out their start times so the site
+    # still sees human-paced searches (a few seconds apart, like the old delays)
+    semaphore = asyncio.Semaphore(4)
+    pace_lock = asyncio.Lock()
+    next_start = 0.0
+    
+    async def scrape(term):
+        nonlocal next_start
+        async with semaphore:
+            async with pace_lock:
+                delay = next_start - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                next_start = time.monotonic() + random.uniform(2, 4)
+            print(f"\n🎯 Scraping: '{term}'")
+            print("-" * 30)
+            return await scraper.bypass_cloudflare_and_scrape(term)
+    
+    results = await asyncio.gather(*(scrape(term) for term in search_terms), return_exceptions=True)
+    
+    for term, products in zip(search_terms, results):
+        if isinstance(products, Exception):
+            print(f"💥 Error scraping '{term}': {products}")
+        elif products:
             print(f"✅ SUCCESS! Found {len(products)} products for '{term}'")
             all_products.extend(products)
             
@@ -343,11 +360,6 @@ async def main():
                 json.dump(products, f, indent=2, ensure_ascii=False)
         else:
             print(f"😞 No products found for '{term}'")
-        
-        # Human-like delay between searches
-        delay = random.randint(5, 10)
-        print(f"⏳ Waiting {delay}s before next search...")
-        await asyncio.sleep(delay)
     
     # Save all results
     if all_products: